@@ -0,0 +1,98 @@
+# async_llm.py
+import asyncio
+import random
+import time
+from config import Config
+from llm_providers import estimate_tokens, is_retryable
+
+
+class TokenBucket:
+    """Asyncio token bucket: `rate_per_minute` tokens refill continuously up to capacity."""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        # A single request larger than the bucket would otherwise wait forever
+        amount = min(amount, self.capacity)
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+class AsyncLLMClient:
+    """Rate-limited, retrying asyncio wrapper around an LLMProvider.
+
+    - at most `max_concurrency` requests in flight
+    - token buckets for requests/min and (estimated) tokens/min
+    - per-attempt timeout (left to providers with bounds_own_timeout, such
+      as a ProviderChain, which time out each member instead)
+    - exponential backoff with full jitter on 429/5xx, timeouts and
+      connection errors; other errors are raised immediately
+    """
+
+    def __init__(self, provider, max_concurrency=None, requests_per_minute=None, tokens_per_minute=None,
+                 timeout=None, max_retries=None, backoff_base=None, backoff_max=None):
+        self.provider = provider
+        self.max_concurrency = max_concurrency or Config.LLM_MAX_CONCURRENCY
+        self.timeout = timeout or Config.LLM_TIMEOUT_SECONDS
+        self.max_retries = Config.LLM_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = backoff_base or Config.LLM_BACKOFF_BASE_SECONDS
+        self.backoff_max = backoff_max or Config.LLM_BACKOFF_MAX_SECONDS
+        self.request_bucket = TokenBucket(requests_per_minute or Config.LLM_REQUESTS_PER_MINUTE)
+        self.token_bucket = TokenBucket(tokens_per_minute or Config.LLM_TOKENS_PER_MINUTE)
+        self.retries = 0
+        self._loop = None
+        self._semaphore = None
+
+    def _bind_loop(self):
+        # asyncio primitives belong to one event loop; rebuild them per loop
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self.request_bucket._lock = asyncio.Lock()
+            self.token_bucket._lock = asyncio.Lock()
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def generate(self, prompt, expected_output_tokens=None):
+        """Return the provider's raw reply text, retrying transient failures."""
+        self._bind_loop()
+        cost = estimate_tokens(prompt) + (expected_output_tokens or Config.LLM_EXPECTED_OUTPUT_TOKENS)
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                await self.request_bucket.acquire(1)
+                await self.token_bucket.acquire(cost)
+                try:
+                    call = self.provider.agenerate(prompt, timeout=self.timeout)
+                    if not self.provider.bounds_own_timeout:
+                        call = asyncio.wait_for(call, self.timeout)
+                    return await call
+                except Exception as e:
+                    if attempt >= self.max_retries or not is_retryable(e):
+                        raise
+                    error = e
+            delay = self._backoff(attempt)
+            attempt += 1
+            self.retries += 1
+            print(f"  ⚠  {self.provider.name} call failed ({type(error).__name__}: {error}); "
+                  f"retry {attempt}/{self.max_retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
@@ -0,0 +1,212 @@
+# batch_executor.py
+import contextlib
+import multiprocessing
+import os
+import sys
+from collections import deque
+from multiprocessing.connection import wait
+from config import Config
+from metrics import METRICS
+
+# Analyzer built in the parent before fork(); children inherit it copy-on-write
+_preloaded_analyzer = None
+
+
+def _limit_native_threads(threads):
+    """One pool of N processes shouldn't also run N x cores OpenMP/OpenCV threads."""
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads)
+    if "cv2" in sys.modules:
+        sys.modules["cv2"].setNumThreads(threads)
+
+
+def _counter_deltas(previous):
+    """Counters bumped since the last call, so the parent can merge them into its METRICS."""
+    current = METRICS.summary()["counters"]
+    deltas = {name: value - previous.get(name, 0) for name, value in current.items() if value != previous.get(name, 0)}
+    previous.update(current)
+    return deltas
+
+
+def _worker_main(conn, rules_only, quiet):
+    from main import MultimodalAnalyzer
+
+    with contextlib.ExitStack() as stack:
+        if quiet:
+            devnull = stack.enter_context(open(os.devnull, "w"))
+            stack.enter_context(contextlib.redirect_stdout(devnull))
+
+        analyzer = _preloaded_analyzer or MultimodalAnalyzer(rules_only=rules_only)
+        _limit_native_threads(Config.EXECUTOR_THREADS_PER_WORKER)
+        counters = METRICS.summary()["counters"]  # Inherited from the parent; don't report twice
+
+        while True:
+            try:
+                task = conn.recv()
+            except EOFError:
+                break
+            if task is None:
+                break
+            task_id, image_path = task
+            try:
+                # Unreadable files are errors here too, as in MultimodalAnalyzer.analyze_many
+                with open(image_path, "rb"):
+                    pass
+                result, error = analyzer.analyze(image_path), None
+            except Exception as e:
+                result, error = None, f"{type(e).__name__}: {e}"
+            conn.send((task_id, result, error, _counter_deltas(counters)))
+    conn.close()
+
+
+class _Worker:
+    def __init__(self, context, rules_only, quiet):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, rules_only, quiet), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.task = None  # (task_id, image_path, attempts) while busy
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+
+
+class ProcessPoolBatchExecutor:
+    """Spread MultimodalAnalyzer.analyze across worker processes.
+
+    With preload=True (and the fork start method) the analyzer is built and
+    YOLO weights loaded once in the parent, so every worker shares those pages
+    copy-on-write instead of loading its own copy. Otherwise each worker builds
+    its own analyzer once at start-up. The LLM client is created lazily, after
+    the fork, so no connection is shared between processes.
+
+    A worker that dies mid-image is replaced; its image is retried up to
+    max_retries times and then reported as an error.
+    """
+
+    def __init__(self, workers=None, rules_only=False, preload=True, max_retries=1, quiet=True):
+        self.num_workers = workers or os.cpu_count() or 1
+        self.rules_only = rules_only
+        self.max_retries = max_retries
+        self.quiet = quiet
+        self.restarts = 0
+
+        global _preloaded_analyzer
+        methods = multiprocessing.get_all_start_methods()
+        self._context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+        if preload and self._context.get_start_method() == "fork" and _preloaded_analyzer is None:
+            from main import MultimodalAnalyzer
+            _preloaded_analyzer = MultimodalAnalyzer(rules_only=rules_only)
+            _preloaded_analyzer.feature_extractor.load_models()
+
+        self._workers = [self._spawn() for _ in range(self.num_workers)]
+
+    def _spawn(self):
+        return _Worker(self._context, self.rules_only, self.quiet)
+
+    def _restart(self, worker):
+        self.restarts += 1
+        worker.process.join(timeout=1)
+        print(f"⚠  Worker {worker.process.pid} exited (code {worker.process.exitcode}); restarting")
+        worker.conn.close()
+        self._workers[self._workers.index(worker)] = replacement = self._spawn()
+        return replacement
+
+    def map(self, image_paths, ordered=True):
+        """Yield (index, image_path, result, error) for every input.
+
+        ordered=True delivers in input order; ordered=False delivers each
+        result as soon as any worker finishes it.
+        """
+        pending = deque((index, path, 0) for index, path in enumerate(image_paths))
+        finished = {}
+        next_index = 0
+        busy = 0
+
+        while pending or busy:
+            for worker in list(self._workers):
+                if worker.task is None and pending:
+                    if not worker.process.is_alive():
+                        worker = self._restart(worker)  # Died while idle
+                    task = pending.popleft()
+                    try:
+                        worker.conn.send(task[:2])
+                    except (BrokenPipeError, OSError):
+                        # Died between the liveness check and the send; the image never
+                        # reached it, so it goes back to the front without using a retry
+                        self._restart(worker)
+                        pending.appendleft(task)
+                        continue
+                    worker.task = task
+                    busy += 1
+
+            handles = {}
+            for worker in self._workers:
+                if worker.task is not None:
+                    handles[worker.conn] = worker
+                    handles[worker.process.sentinel] = worker
+
+            ready = []
+            for handle in wait(list(handles)) if handles else []:
+                if handles[handle] not in ready:
+                    ready.append(handles[handle])
+
+            completed = []
+            for worker in ready:
+                index, path, attempts = worker.task
+                worker.task = None
+                busy -= 1
+                try:
+                    # Prefer a result that was sent just before the process exited
+                    if not worker.conn.poll():
+                        raise EOFError
+                    task_id, result, error, counter_deltas = worker.conn.recv()
+                    self._record_metrics(result, counter_deltas)
+                    completed.append((index, path, result, error))
+                except (EOFError, OSError):
+                    self._restart(worker)
+                    if attempts < self.max_retries:
+                        pending.appendleft((index, path, attempts + 1))
+                    else:
+                        completed.append((index, path, None, "worker process crashed"))
+
+            for item in completed:
+                if not ordered:
+                    yield item
+                    continue
+                finished[item[0]] = item
+                while next_index in finished:
+                    yield finished.pop(next_index)
+                    next_index += 1
+
+    @staticmethod
+    def _record_metrics(result, counter_deltas):
+        # Stage histograms live in the workers; rebuild them here from each
+        # result's timings so the parent's METRICS covers the whole run
+        for name, amount in counter_deltas.items():
+            METRICS.inc(name, amount)
+        for stage, ms in (result or {}).get("timings", {}).items():
+            METRICS.observe(stage, ms / 1000)
+
+    def analyze_many(self, image_paths, batch_size=None):
+        """Same contract as MultimodalAnalyzer.analyze_many (ordered (path, result, error))."""
+        for _, image_path, result, error in self.map(image_paths, ordered=True):
+            yield image_path, result, error
+
+    def close(self):
+        for worker in self._workers:
+            worker.stop()
+        self._workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
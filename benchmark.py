@@ -0,0 +1,222 @@
+# benchmark.py
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+import numpy as np
+from config import Config
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process over its lifetime, in MB (None where unsupported)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def percentiles(samples_ms):
+    if not samples_ms:
+        return {"count": 0}
+    values = np.asarray(samples_ms)
+    return {
+        "count": len(values),
+        "mean_ms": round(float(values.mean()), 2),
+        "p50_ms": round(float(np.percentile(values, 50)), 2),
+        "p95_ms": round(float(np.percentile(values, 95)), 2),
+        "p99_ms": round(float(np.percentile(values, 99)), 2),
+    }
+
+
+def environment():
+    import cv2
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+    }
+
+
+def run_phase(image_paths, run_one, warmup):
+    """Time run_one(path) -> stage timings (ms) over the corpus, after a warm-up pass."""
+    for image_path in image_paths[:warmup]:
+        run_one(image_path)
+
+    stage_samples = {}
+    latencies = []
+    started = time.perf_counter()
+    for image_path in image_paths:
+        image_started = time.perf_counter()
+        timings = run_one(image_path)
+        latencies.append((time.perf_counter() - image_started) * 1000)
+        for stage, ms in timings.items():
+            if stage != "total":
+                stage_samples.setdefault(stage, []).append(ms)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "images": len(image_paths),
+        "seconds": round(elapsed, 3),
+        "images_per_sec": round(len(image_paths) / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency": percentiles(latencies),
+        "stages": {stage: percentiles(samples) for stage, samples in sorted(stage_samples.items())},
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def benchmark_features(image_paths, warmup):
+    from feature_extractor import FeatureExtractor
+    from image_io import DecodedImage
+    from metrics import trace
+
+    extractor = FeatureExtractor()
+    extractor.load_models()
+
+    def run_one(image_path):
+        with trace() as active:
+            extractor.run_all(DecodedImage.from_path(image_path))
+        return active.timings()
+
+    try:
+        return run_phase(image_paths, run_one, warmup)
+    finally:
+        extractor.close()
+
+
+def benchmark_analyze(image_paths, warmup, llm_latency):
+    from llm_providers import FakeProvider
+    from main import MultimodalAnalyzer
+
+    analyzer = MultimodalAnalyzer(llm_provider=FakeProvider(latency=llm_latency))
+    analyzer.feature_extractor.load_models()
+
+    def run_one(image_path):
+        return analyzer.analyze(image_path)["timings"]
+
+    try:
+        return run_phase(image_paths, run_one, warmup)
+    finally:
+        analyzer.feature_extractor.close()
+
+
+def _phase_main(phase, image_paths, warmup, llm_latency):
+    # Runs in a fresh process: repeat main()'s settings, which a spawned child does not inherit
+    Config.FEATURE_CACHE_ENABLED = False
+    Config.LLM_CACHE_ENABLED = False
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        if phase == "features":
+            return benchmark_features(image_paths, warmup)
+        return benchmark_analyze(image_paths, warmup, llm_latency)
+
+
+def run_isolated(phase, image_paths, warmup, llm_latency):
+    """Run one phase in its own process, so its peak RSS covers that phase alone."""
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(_phase_main, (phase, image_paths, warmup, llm_latency))
+
+
+def compare(current, baseline):
+    """Print throughput and p95 changes against an earlier results file."""
+    print(f"\nComparison with {baseline['environment'].get('git_commit')} "
+          f"({baseline['environment'].get('timestamp')}):")
+    for phase, result in current["phases"].items():
+        before = baseline.get("phases", {}).get(phase)
+        if not before:
+            continue
+        rate, old_rate = result["images_per_sec"], before["images_per_sec"]
+        change = (rate - old_rate) / old_rate * 100 if old_rate else 0.0
+        print(f"  {phase}: {old_rate} -> {rate} img/s ({change:+.1f}%), "
+              f"p95 {before['latency'].get('p95_ms')} -> {result['latency'].get('p95_ms')} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Throughput benchmark on a deterministic synthetic corpus.")
+    parser.add_argument("--corpus", default="bench_corpus", help="corpus directory (generated if missing)")
+    parser.add_argument("--count", type=int, help="corpus size (default: 200); an existing corpus with a "
+                                                   "different --count or --seed is regenerated")
+    parser.add_argument("--seed", type=int, help="corpus seed (default: 0)")
+    parser.add_argument("--phase", choices=["features", "analyze", "all"], default="all",
+                        help="features = FeatureExtractor.run_all, analyze = full MultimodalAnalyzer.analyze")
+    parser.add_argument("--warmup", type=int, default=5, help="images run before timing starts (default: 5)")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0,
+                        help="simulated latency of the fake LLM provider (default: 0)")
+    parser.add_argument("-o", "--output", help="results JSON path (default: benchmark_<timestamp>.json)")
+    parser.add_argument("--compare", metavar="JSON", help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    # Caches would turn every repeat into a hit; the LLM is always the in-process fake
+    Config.FEATURE_CACHE_ENABLED = False
+    Config.LLM_CACHE_ENABLED = False
+
+    manifest_path = os.path.join(args.corpus, "corpus.json")
+    manifest = None
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if ((args.count is not None and args.count != manifest["count"])
+                or (args.seed is not None and args.seed != manifest["seed"])):
+            print(f"Corpus in {args.corpus} has count={manifest['count']} seed={manifest['seed']}; regenerating")
+            manifest = None
+    if manifest is None:
+        from create_test_images import create_corpus
+        create_corpus(args.corpus, 200 if args.count is None else args.count, args.seed or 0)
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    image_paths = [os.path.join(args.corpus, image["file"]) for image in manifest["images"]]
+
+    results = {
+        "environment": environment(),
+        "corpus": {"path": args.corpus, "count": manifest["count"], "seed": manifest["seed"]},
+        "settings": {
+            "warmup": args.warmup,
+            "llm_latency_ms": args.llm_latency_ms,
+            "concurrent_extraction": Config.CONCURRENT_EXTRACTION,
+            "early_exit": Config.EARLY_EXIT_ENABLED,
+            "yolo_model": Config.YOLO_MODEL_PATH,
+            "ocr_backend": Config.OCR_BACKEND,
+        },
+        "phases": {},
+    }
+
+    # Each phase gets a fresh process (pipeline logging silenced there): ru_maxrss
+    # is a lifetime peak, so a shared process would report features' peak for analyze too
+    for phase in ("features", "analyze"):
+        if args.phase in (phase, "all"):
+            results["phases"][phase] = run_isolated(phase, image_paths, args.warmup, args.llm_latency_ms / 1000)
+
+    output = args.output or f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    for phase, result in results["phases"].items():
+        latency = result["latency"]
+        print(f"{phase}: {result['images_per_sec']} img/s, p50 {latency['p50_ms']} ms, "
+              f"p95 {latency['p95_ms']} ms, p99 {latency['p99_ms']} ms, peak RSS {result['peak_rss_mb']} MB")
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -16,12 +16,127 @@ class Config:
     # Google Gemini API - CORRECTED MODEL NAME
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
     GEMINI_MODEL = "gemini-2.0-flash-latest"  # Try this
+    GEMINI_FALLBACK_MODELS = [  # Tried in order if GEMINI_MODEL is not found on first use
+        "gemini-2.0-flash",
+        "gemini-2.0-flash-001",
+        "gemini-pro-latest",
+        "gemini-1.5-flash",
+    ]
+    
+    # Last known-good model per provider, so restarts skip validation
+    LLM_MODEL_STATE_PATH = os.path.join(".cache", "llm_models.json")
+    
+    # LLM request control (timeouts apply to sync calls too)
+    LLM_TIMEOUT_SECONDS = 30
+    LLM_MAX_CONCURRENCY = 8          # Max in-flight requests on the async path
+    LLM_REQUESTS_PER_MINUTE = 60
+    LLM_TOKENS_PER_MINUTE = 60000
+    LLM_EXPECTED_OUTPUT_TOKENS = 250  # Reserved per request (per image in batched requests) by the token limiter
+    PROMPT_TOKEN_BUDGET = 600         # Estimated tokens per single-image prompt; features are compacted to fit
+    PROMPT_MAX_OCR_CHARS = 400        # OCR text is deduplicated, then cut to this many characters
+    LLM_BATCH_SIZE = 1                # Images per LLM request in batch mode; >1 packs several into one prompt
+    LLM_MAX_RETRIES = 4               # Retries on 429/5xx, timeouts and connection errors
+    LLM_BACKOFF_BASE_SECONDS = 0.5
+    LLM_BACKOFF_MAX_SECONDS = 20
+    
+    # Ordered provider chain (llm_chain.py), e.g. LLM_PROVIDER_CHAIN=openai,gemini,rules.
+    # Empty = just LLM_PROVIDER. Rules are always the last resort.
+    LLM_PROVIDER_CHAIN = [name for name in os.getenv("LLM_PROVIDER_CHAIN", "").split(",") if name.strip()]
+    LLM_HEDGING_ENABLED = False             # Also ask the next provider once the first is slower than its p95
+    LLM_HEDGE_DEFAULT_DELAY_SECONDS = 2.0   # Hedge delay until there are enough latency samples for a p95
+    LLM_HEDGE_MIN_DELAY_SECONDS = 0.2
+    LLM_BREAKER_WINDOW = 20                 # Recent calls per provider the breaker looks at
+    LLM_BREAKER_MIN_CALLS = 5
+    LLM_BREAKER_ERROR_RATE = 0.5            # Failed share of the window that opens the circuit
+    LLM_BREAKER_SLOW_CALL_SECONDS = 10
+    LLM_BREAKER_SLOW_CALL_RATE = 0.5        # Slow share of the window that opens the circuit
+    LLM_BREAKER_COOLDOWN_SECONDS = 30       # Open circuits let one probe through after this
+    
+    # LLM response cache (keyed on provider, model and prompt hash)
+    LLM_CACHE_ENABLED = True
+    LLM_CACHE_MAX_ENTRIES = 1024
+    LLM_CACHE_TTL_SECONDS = 7 * 24 * 3600  # None = never expire
+    LLM_CACHE_PATH = None  # e.g. os.path.join(".cache", "llm_responses.sqlite3") for an on-disk tier
+    LLM_CACHE_BYPASS = False  # Force fresh calls (new answers are still cached)
+    
+    # Confidence-gated LLM routing: only rule results that are not clear-cut go to the LLM
+    LLM_ROUTING_ENABLED = False
+    LLM_ROUTING_SCORE_BAND = (0.45, 0.8)  # Rule scores inside this band are ambiguous
+    LLM_ROUTING_MIN_CONFIDENCE = 0.75     # Above the band, lower confidence still calls the LLM
+    LLM_ROUTING_REJECT_ISSUES = 2         # This many rule issues is a certain rejection
     
     # Feature Extraction Models
     YOLO_MODEL_PATH = "yolo11n.pt"
+    YOLO_BATCH_SIZE = 16  # Images per YOLO call in extract_objects_batch / run_all_batch
+    
+    # Resolution each extractor works at (longest side, px). Images are decoded
+    # with JPEG DCT scaling at the smallest size that serves detection and
+    # text-region detection; OCR decodes again at OCR_MAX_SIDE, and only for
+    # images that have text regions.
+    DETECTION_MAX_SIDE = 640     # YOLO letterboxes to 640 anyway
+    OCR_MAX_SIDE = 2048
+    # Blur is always scored at full resolution, which its thresholds assume
+    
+    # Run detection, OCR and blur scoring concurrently within one image
+    CONCURRENT_EXTRACTION = False
     
     # OCR Configuration
-    TESSERACT_PATH = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+    OCR_BACKEND = os.getenv("OCR_BACKEND", "auto")  # "tesserocr" (in-process), "pytesseract" or "auto"
+    TESSERACT_PATH = os.getenv("TESSERACT_PATH")    # tesseract binary for pytesseract; None = found on PATH
+    TESSDATA_PATH = os.getenv("TESSDATA_PREFIX")    # traineddata directory for tesserocr; None = default
+    OCR_LANGUAGE = "eng"
+    OCR_ENGINE_MODE = 3    # OEM 3 = default
+    OCR_PAGE_SEG_MODE = 6  # PSM 6 = assume uniform block of text
+    OCR_BINARY_THRESHOLD = 150
+    
+    # Text-region detection in front of OCR: Tesseract only runs on cropped
+    # candidate regions, and not at all when an image has none
+    TEXT_REGION_DETECTION = True
+    TEXT_DETECTION_MAX_SIDE = 1024  # Regions are found on this pyramid level, cropped at OCR_MAX_SIDE
+    TEXT_REGION_MIN_HEIGHT = 8      # px at TEXT_DETECTION_MAX_SIDE
+    TEXT_REGION_MIN_GRADIENT = 40
+    TEXT_REGION_MAX_GLYPH = 0.1     # Edge components longer than this share of the image side are outlines
+    OCR_MAX_REGIONS = 12            # More candidates than this and the whole image is OCR'd instead
+    
+    # Persistent feature cache (keyed on image content + extractor settings)
+    FEATURE_CACHE_ENABLED = False
+    FEATURE_CACHE_PATH = os.path.join(".cache", "features.sqlite3")
+    FEATURE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+    FEATURE_EXTRACTOR_VERSION = 7  # Bump when extractor output changes
+    
+    # Incremental catalog manifest (manifest.py, main.py --manifest)
+    MANIFEST_PATH = os.path.join(".cache", "manifest.sqlite3")
+    REASONING_VERSION = 1  # Bump when rule/blending code changes (weights, keywords and prompt are hashed)
     
     # Analysis Parameters
-    OBJECT_CONFIDENCE_THRESHOLD = 0.25
\ No newline at end of file
+    OBJECT_CONFIDENCE_THRESHOLD = 0.25
+    
+    # Early-exit quality gates: images failing any hard threshold are rejected
+    # by rules before detection, OCR or an LLM call
+    EARLY_EXIT_ENABLED = False
+    GATE_MIN_BLUR_SCORE = 0.05   # blur_score is full-resolution Laplacian variance / 200
+    GATE_MIN_WIDTH = 200
+    GATE_MIN_HEIGHT = 200
+    GATE_MIN_BRIGHTNESS = 0.08   # Mean gray level, 0-1
+    GATE_MAX_BRIGHTNESS = 0.98
+    
+    # Near-duplicate reuse (near_duplicates.py): an image whose perceptual hashes
+    # are this close to an already-analyzed image reuses that analysis
+    NEAR_DUPLICATE_DETECTION = False
+    NEAR_DUPLICATE_MAX_DISTANCE = 10         # pHash bits (of 64)
+    NEAR_DUPLICATE_MAX_DHASH_DISTANCE = 12   # dHash bits (of 64), as a second check
+    NEAR_DUPLICATE_MAX_ENTRIES = 100000
+    NEAR_DUPLICATE_HASH_SIDE = 256           # Pyramid level the hashes are computed on
+    
+    # Process-pool batch executor (batch_executor.py)
+    EXECUTOR_THREADS_PER_WORKER = 1  # torch/OpenCV threads per worker process
+    
+    # Analysis service (service.py)
+    SERVICE_HOST = "127.0.0.1"
+    SERVICE_PORT = 8080
+    SERVICE_MAX_BATCH_SIZE = 8       # Images per micro-batch (one YOLO call)
+    SERVICE_MAX_WAIT_MS = 25         # Max time the oldest request waits for a batch to fill
+    SERVICE_MAX_QUEUE = 256          # Requests beyond this are rejected with 503
+    SERVICE_REASONING_WORKERS = 16   # Concurrent reasoning/LLM calls
+    SERVICE_REQUEST_TIMEOUT_SECONDS = 120
+    SERVICE_ALLOW_PATH_INPUT = True  # Allow {"path": ...} requests (server-local files)
@@ -1,4 +1,6 @@
 # create_test_images.py
+import argparse
+import json
 import os
 from PIL import Image, ImageDraw, ImageFont
 import numpy as np
@@ -66,9 +68,87 @@ def create_cluttered_image():
     img.save('samples/cluttered_image.jpg')
     print("Created: samples/cluttered_image.jpg")
 
+# Corpus parameter grid: every image picks one value from each
+CORPUS_RESOLUTIONS = [(640, 480), (1024, 768), (1600, 1200), (1920, 1080), (3000, 2000), (4000, 3000)]
+CORPUS_BLUR_KERNELS = [0, 0, 5, 15, 41]  # 0 = sharp; weighted towards sharp like a real catalog
+CORPUS_MAX_OBJECTS = 8
+CORPUS_TEXT_LINES = [0, 0, 0, 1, 2, 4]   # Most product photos carry no text
+CORPUS_WORDS = ["SALE", "price", "$19.99", "brand", "model X", "size M", "www.shop.com", "new", "limited", "item"]
+
+def create_corpus_image(index, seed):
+    """One deterministic synthetic image; returns (PIL image, parameters)."""
+    rng = np.random.RandomState(seed * 100003 + index)
+    width, height = CORPUS_RESOLUTIONS[rng.randint(len(CORPUS_RESOLUTIONS))]
+    blur = CORPUS_BLUR_KERNELS[rng.randint(len(CORPUS_BLUR_KERNELS))]
+    object_count = int(rng.randint(CORPUS_MAX_OBJECTS + 1))
+    text_lines = CORPUS_TEXT_LINES[rng.randint(len(CORPUS_TEXT_LINES))]
+    
+    background = tuple(int(c) for c in rng.randint(180, 256, size=3))
+    img = Image.new('RGB', (width, height), color=background)
+    draw = ImageDraw.Draw(img)
+    
+    for _ in range(object_count):
+        w = int(rng.randint(width // 10, width // 3))
+        h = int(rng.randint(height // 10, height // 3))
+        x = int(rng.randint(0, width - w))
+        y = int(rng.randint(0, height - h))
+        color = tuple(int(c) for c in rng.randint(0, 200, size=3))
+        if rng.rand() < 0.5:
+            draw.rectangle([x, y, x + w, y + h], fill=color, outline='black', width=3)
+        else:
+            draw.ellipse([x, y, x + w, y + h], fill=color, outline='black', width=3)
+    
+    # Pillow's bundled font, so text renders the same on every machine
+    try:
+        font = ImageFont.load_default(size=max(12, height // 30))
+    except TypeError:  # Pillow < 10.1 only has the fixed-size bitmap font
+        font = ImageFont.load_default()
+    for line in range(text_lines):
+        words = [CORPUS_WORDS[i] for i in rng.randint(len(CORPUS_WORDS), size=4)]
+        x = int(rng.randint(0, width // 2))
+        y = int(height * (line + 1) / (text_lines + 2))
+        draw.text((x, y), " ".join(words), fill='black', font=font)
+    
+    if blur:
+        img = Image.fromarray(cv2.GaussianBlur(np.array(img), (blur, blur), 0))
+    
+    params = {"width": width, "height": height, "blur_kernel": blur,
+              "object_count": object_count, "text_lines": text_lines}
+    return img, params
+
+def create_corpus(output_dir, count, seed=0):
+    """Write `count` deterministic images plus corpus.json describing each one.
+    
+    The same (count, seed) always produces the same images, so benchmark runs
+    on the same machine can be compared.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    images = []
+    for index in range(count):
+        img, params = create_corpus_image(index, seed)
+        filename = f"corpus_{index:06d}.jpg"
+        img.save(os.path.join(output_dir, filename), quality=90)
+        images.append({"file": filename, **params})
+        if (index + 1) % 100 == 0 or index + 1 == count:
+            print(f"Created {index + 1}/{count} images in {output_dir}")
+    
+    with open(os.path.join(output_dir, "corpus.json"), "w") as f:
+        json.dump({"seed": seed, "count": count, "images": images}, f, indent=2)
+    return [os.path.join(output_dir, image["file"]) for image in images]
+
 if __name__ == "__main__":
-    print("Creating test images...")
-    create_professional_product()
-    create_blurry_image()
-    create_cluttered_image()
-    print("\nTest images created in 'samples' folder!")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Create sample images, or a synthetic benchmark corpus.")
+    parser.add_argument("--corpus", metavar="DIR",
+                        help="write a deterministic corpus here instead of the three samples")
+    parser.add_argument("--count", type=int, default=1000, help="corpus size (default: 1000)")
+    parser.add_argument("--seed", type=int, default=0, help="corpus seed (default: 0)")
+    args = parser.parse_args()
+    
+    if args.corpus:
+        create_corpus(args.corpus, args.count, args.seed)
+    else:
+        print("Creating test images...")
+        create_professional_product()
+        create_blurry_image()
+        create_cluttered_image()
+        print("\nTest images created in 'samples' folder!")
\ No newline at end of file
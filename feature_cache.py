@@ -0,0 +1,153 @@
+# feature_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from config import Config
+
+
+def extractor_fingerprint(ocr_backend):
+    """Hash of every setting that changes what FeatureExtractor.run_all returns.
+
+    ocr_backend is the name of the backend actually loaded (what "auto"
+    resolved to), or None without OCR. Bump Config.FEATURE_EXTRACTOR_VERSION
+    when extractor code changes so old cache entries stop matching.
+    """
+    settings = {
+        "version": Config.FEATURE_EXTRACTOR_VERSION,
+        "yolo_model": Config.YOLO_MODEL_PATH,
+        "confidence_threshold": Config.OBJECT_CONFIDENCE_THRESHOLD,
+        "ocr_backend": ocr_backend,
+        "ocr_modes": [Config.OCR_LANGUAGE, Config.OCR_ENGINE_MODE, Config.OCR_PAGE_SEG_MODE],
+        "ocr_threshold": Config.OCR_BINARY_THRESHOLD,
+        "resolutions": [Config.DETECTION_MAX_SIDE, Config.OCR_MAX_SIDE],
+        "text_regions": [
+            Config.TEXT_REGION_DETECTION, Config.TEXT_DETECTION_MAX_SIDE, Config.TEXT_REGION_MIN_HEIGHT,
+            Config.TEXT_REGION_MIN_GRADIENT, Config.TEXT_REGION_MAX_GLYPH, Config.OCR_MAX_REGIONS,
+        ],
+    }
+    encoded = json.dumps(settings, sort_keys=True).encode()
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+class FeatureCache:
+    """Persistent, content-addressed cache of FeatureExtractor.run_all results.
+
+    Entries are keyed on the image content hash plus the extractor
+    fingerprint, stored in SQLite so they survive restarts, and evicted
+    least-recently-used once the stored payload exceeds max_bytes. The
+    payload size is tracked as a running total; the table is only summed
+    again when that total crosses max_bytes (other processes may share the
+    file).
+    """
+
+    def __init__(self, path=None, max_bytes=None):
+        self.path = path or Config.FEATURE_CACHE_PATH
+        self.max_bytes = max_bytes if max_bytes is not None else Config.FEATURE_CACHE_MAX_BYTES
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._fingerprints = {}  # OCR backend name -> extractor fingerprint
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+        self._total_size = 0
+
+    def _connection(self):
+        # SQLite connections must not cross fork(); reopen in child processes
+        if self._conn is None or self._conn_pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS features ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS features_lru ON features (last_access)")
+            conn.commit()
+            self._conn = conn
+            self._conn_pid = os.getpid()
+            self._total_size = self._stored_size(conn)
+        return self._conn
+
+    @staticmethod
+    def _stored_size(conn):
+        return conn.execute("SELECT COALESCE(SUM(size), 0) FROM features").fetchone()[0]
+
+    def key_for(self, image, ocr_backend):
+        fingerprint = self._fingerprints.get(ocr_backend)
+        if fingerprint is None:
+            fingerprint = self._fingerprints[ocr_backend] = extractor_fingerprint(ocr_backend)
+        return f"{image.content_hash}:{fingerprint}"
+
+    def get(self, image, ocr_backend):
+        """Return cached features for a DecodedImage, or None on a miss.
+
+        ocr_backend is the loaded OCR backend's name (see extractor_fingerprint).
+        """
+        key = self.key_for(image, ocr_backend)
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT value FROM features WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE features SET last_access = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, image, features, ocr_backend):
+        """Store features for a DecodedImage and evict LRU entries over budget."""
+        key = self.key_for(image, ocr_backend)
+        value = json.dumps(features)
+        with self._lock:
+            conn = self._connection()
+            replaced = conn.execute("SELECT size FROM features WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO features (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, len(value), time.time()),
+            )
+            self._total_size += len(value) - (replaced[0] if replaced else 0)
+            if self._total_size > self.max_bytes:
+                self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn):
+        # Exact size, including what other processes wrote since the last sum
+        total = self._stored_size(conn)
+        if total > self.max_bytes:
+            for key, size in conn.execute("SELECT key, size FROM features ORDER BY last_access").fetchall():
+                if total <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM features WHERE key = ?", (key,))
+                total -= size
+                self.evictions += 1
+        self._total_size = total
+
+    def clear(self):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM features")
+            conn.commit()
+            self._total_size = 0
+
+    def stats(self):
+        with self._lock:
+            conn = self._connection()
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM features").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "size_bytes": size,
+            "max_bytes": self.max_bytes,
+        }
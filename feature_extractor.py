@@ -1,68 +1,174 @@
-from ultralytics import YOLO
-import pytesseract
-from PIL import Image
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import cv2
-import numpy as np
 from config import Config
+from feature_cache import FeatureCache
+from image_io import as_decoded_image
+from metrics import METRICS, span, submit_in_context
+from ocr_backends import create_ocr_backend
+from text_regions import detect_text_regions, scale_regions
 
 class FeatureExtractor:
-    def __init__(self):
-        # Load YOLO model once at initialization
-        print("Loading YOLO model for object detection...")
-        self.object_detector = YOLO(Config.YOLO_MODEL_PATH)
+    def __init__(self, concurrent=None, feature_cache=None, ocr_backend=None):
+        # Opt-in: overlap detection, OCR and blur scoring on a thread pool
+        self.concurrent = Config.CONCURRENT_EXTRACTION if concurrent is None else concurrent
+        self._executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="extractor") if self.concurrent else None
         
-        # Set Tesseract path explicitly
-        pytesseract.pytesseract.tesseract_cmd = Config.TESSERACT_PATH
-        print(f"✓ Tesseract configured at: {Config.TESSERACT_PATH}")
+        # Persistent feature cache
+        if feature_cache is None and Config.FEATURE_CACHE_ENABLED:
+            feature_cache = FeatureCache()
+            print(f"✓ Feature cache enabled at: {feature_cache.path}")
+        self.feature_cache = feature_cache
         
-        # Verify Tesseract works
-        try:
-            version = pytesseract.get_tesseract_version()
-            print(f"✓ Tesseract version: {version}")
-            self.tesseract_available = True
-        except:
-            print("✗ Tesseract verification failed")
-            self.tesseract_available = False
-    
-    def extract_objects(self, image_path):
+        # YOLO (ultralytics/torch) and Tesseract are imported and loaded on
+        # first use; call load_models() to pay that cost up front instead
+        self._object_detector = None
+        self._ocr_backend = ocr_backend
+        self._ocr_loaded = ocr_backend is not None
+        self._load_lock = threading.RLock()
+    
+    @property
+    def object_detector(self):
+        """YOLO model, loaded once on first use."""
+        if self._object_detector is None:
+            with self._load_lock:
+                if self._object_detector is None:
+                    from ultralytics import YOLO
+                    print("Loading YOLO model for object detection...")
+                    self._object_detector = YOLO(Config.YOLO_MODEL_PATH)
+        return self._object_detector
+    
+    @property
+    def ocr_backend(self):
+        """OCR backend (Config.OCR_BACKEND), loaded once on first use; None if none works."""
+        if not self._ocr_loaded:
+            with self._load_lock:
+                if not self._ocr_loaded:
+                    self._ocr_backend = create_ocr_backend()
+                    self._ocr_loaded = True
+        return self._ocr_backend
+    
+    @property
+    def ocr_backend_name(self):
+        """Name of the loaded OCR backend (what "auto" resolved to); None without OCR."""
+        backend = self.ocr_backend
+        if backend is None:
+            return None
+        return getattr(backend, "name", type(backend).__name__)
+    
+    @property
+    def tesseract_available(self):
+        """Whether an OCR backend works, verified once on first use."""
+        return self.ocr_backend is not None
+    
+    def prepare(self, image):
+        """Decode once at the smallest size detection and text-region detection allow.
+        
+        OCR_MAX_SIDE is only included when text-region detection is off:
+        otherwise extract_text asks for that level only when the image has
+        text regions, and the image then decodes again at the higher resolution.
+        """
+        max_sides = [Config.DETECTION_MAX_SIDE, Config.TEXT_DETECTION_MAX_SIDE]
+        if not Config.TEXT_REGION_DETECTION:
+            max_sides.append(Config.OCR_MAX_SIDE)
+        image.prepare(max_sides)
+    
+    def load_models(self):
+        """Load YOLO and verify Tesseract now rather than on first use."""
+        self.object_detector
+        self.tesseract_available
+    
+    def extract_objects(self, image):
         """Run object detection and return list of detected objects with confidences."""
+        image = as_decoded_image(image)
         try:
-            print(f"  Running object detection on {image_path}...")
-            results = self.object_detector(image_path)[0]
-            detections = []
-            if results.boxes is not None:
-                for box, cls in zip(results.boxes, results.boxes.cls):
-                    conf = float(box.conf[0])
-                    if conf >= Config.OBJECT_CONFIDENCE_THRESHOLD:
-                        class_name = results.names[int(cls)]
-                        detections.append({
-                            "object": class_name,
-                            "confidence": round(conf, 3)
-                        })
+            print(f"  Running object detection on {image.name}...")
+            pixels = image.at_max_side(Config.DETECTION_MAX_SIDE)
+            with span("yolo"):
+                results = self.object_detector(pixels)[0]
+            detections = self._parse_detections(results)
             print(f"  Found {len(detections)} objects")
             return detections
         except Exception as e:
             print(f"⚠  Object detection failed: {e}")
             return []
     
-    def extract_text(self, image_path):
+    def extract_objects_batch(self, images):
+        """Run object detection on many images, Config.YOLO_BATCH_SIZE per YOLO call.
+        
+        Returns one detection list per input image, in input order. Images that
+        cannot be decoded get an empty list; if a whole batch fails, its images
+        are retried one at a time so a single bad input cannot sink the rest.
+        """
+        images = [as_decoded_image(image) for image in images]
+        detections = [[] for _ in images]
+        batch_size = max(1, Config.YOLO_BATCH_SIZE)
+        
+        for start in range(0, len(images), batch_size):
+            chunk = []
+            for index in range(start, min(start + batch_size, len(images))):
+                try:
+                    self.prepare(images[index])
+                    chunk.append((index, images[index].at_max_side(Config.DETECTION_MAX_SIDE)))
+                except Exception as e:
+                    print(f"⚠  Object detection failed for {images[index].name}: {e}")
+            if not chunk:
+                continue
+            
+            print(f"  Running batched object detection on {len(chunk)} images...")
+            try:
+                with span("yolo"):
+                    batch_results = self.object_detector([pixels for _, pixels in chunk])
+                for (index, _), results in zip(chunk, batch_results):
+                    detections[index] = self._parse_detections(results)
+            except Exception as e:
+                print(f"⚠  Batched object detection failed ({e}), retrying images individually")
+                for index, _ in chunk:
+                    detections[index] = self.extract_objects(images[index])
+        
+        return detections
+    
+    def _parse_detections(self, results):
+        """Convert one YOLO result into [{"object", "confidence"}] above the threshold."""
+        detections = []
+        if results.boxes is not None:
+            for box, cls in zip(results.boxes, results.boxes.cls):
+                conf = float(box.conf[0])
+                if conf >= Config.OBJECT_CONFIDENCE_THRESHOLD:
+                    class_name = results.names[int(cls)]
+                    detections.append({
+                        "object": class_name,
+                        "confidence": round(conf, 3)
+                    })
+        return detections
+    
+    def extract_text(self, image):
         """Extract text from image using Tesseract OCR."""
         if not self.tesseract_available:
             return ""
         
+        image = as_decoded_image(image)
         try:
-            image = Image.open(image_path)
+            regions = self.find_text_regions(image)
+            if regions == []:
+                print("  No text regions found, skipping OCR")
+                return ""
             
-            # Preprocess for better OCR
-            # Convert to grayscale
-            gray = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2GRAY)
+            # Preprocess for better OCR (shared grayscale pyramid level)
+            gray = image.gray_at(Config.OCR_MAX_SIDE)
             
             # Apply thresholding for better text recognition
-            _, thresh = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY)
+            _, thresh = cv2.threshold(gray, Config.OCR_BINARY_THRESHOLD, 255, cv2.THRESH_BINARY)
             
             # Use Tesseract with optimized settings for product images
-            custom_config = r'--oem 3 --psm 6'  # OEM 3 = default, PSM 6 = assume uniform block of text
-            text = pytesseract.image_to_string(thresh, config=custom_config)
+            ocr = self.ocr_backend
+            with span("ocr"):
+                if regions is None:
+                    text = ocr.image_to_string(thresh)
+                else:
+                    crops = scale_regions(regions, image.gray_at(Config.TEXT_DETECTION_MAX_SIDE).shape, thresh.shape)
+                    texts = [ocr.image_to_string(thresh[y:y + h, x:x + w]).strip() for x, y, w, h in crops]
+                    text = "\n".join(t for t in texts if t)
             
             cleaned_text = text.strip()
             # Filter out meaningless single characters/punctuation
@@ -78,18 +184,40 @@ class FeatureExtractor:
             print(f"⚠  OCR extraction failed: {e}")
             return ""
     
-    def extract_blur_score(self, image_path):
-        """Calculate image blur score using Laplacian variance."""
+    def find_text_regions(self, image):
+        """Candidate text boxes at TEXT_DETECTION_MAX_SIDE.
+        
+        [] means no text (OCR is skipped); None means OCR the whole image,
+        either because detection is disabled or the image is text-heavy.
+        """
+        image = as_decoded_image(image)
+        if not Config.TEXT_REGION_DETECTION:
+            return None
+        if "text_regions" not in image.derived:
+            gray = image.gray_at(Config.TEXT_DETECTION_MAX_SIDE)
+            with span("text_regions"):
+                image.derived["text_regions"] = detect_text_regions(gray)
+        return image.derived["text_regions"]
+    
+    def extract_blur_score(self, image):
+        """Calculate image blur score using Laplacian variance.
+        
+        Laplacian variance depends on resolution, so it is always measured
+        on the full-resolution image (decoded to grayscale just for this, not
+        from the reduced pyramid): the score and its thresholds then mean the
+        same whatever the upload size.
+        """
+        image = as_decoded_image(image)
+        if "blur_score" in image.derived:
+            return image.derived["blur_score"]
         try:
-            image = cv2.imread(image_path)
-            if image is None:
-                return 0.0
-            
-            # Convert to grayscale
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            gray = image.full_resolution_gray()
             
-            # Calculate Laplacian variance
-            laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
+            # Calculate Laplacian variance (int16 holds the 3x3 kernel's range
+            # exactly and is several times faster than float64 on large images)
+            with span("blur"):
+                _, stddev = cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_16S))
+                laplacian_var = float(stddev[0, 0]) ** 2
             
             # Normalize to 0-1 scale
             # Typical values: >100 = sharp, <50 = blurry
@@ -98,20 +226,158 @@ class FeatureExtractor:
             assessment = "sharp" if blur_score > 0.5 else "slightly blurry" if blur_score > 0.25 else "blurry"
             print(f"  Image sharpness: {assessment} ({blur_score:.3f})")
             
-            return round(blur_score, 3)
+            image.derived["blur_score"] = round(blur_score, 3)
+            return image.derived["blur_score"]
         except Exception as e:
             print(f"⚠  Blur detection failed: {e}")
             return 0.0
     
-    def run_all(self, image_path):
-        """Run all available feature extractors and return consolidated results."""
+    def extract_quality_gates(self, image):
+        """Cheap measurements for early rejection: sharpness, resolution, brightness.
+        
+        Returns None if the image cannot be decoded.
+        """
+        image = as_decoded_image(image)
+        try:
+            width, height = image.size
+            self.prepare(image)
+            brightness = float(image.gray_at(Config.DETECTION_MAX_SIDE).mean()) / 255
+        except Exception as e:
+            print(f"⚠  Quality gate measurement failed: {e}")
+            return None
+        return {
+            "blur_score": self.extract_blur_score(image),
+            "width": width,
+            "height": height,
+            "brightness": round(brightness, 3),
+        }
+    
+    def run_all(self, image):
+        """Run all available feature extractors and return consolidated results.
+        
+        Accepts a file path or a DecodedImage; the image is decoded once and
+        the same pixels are shared by every extractor. Raises ValueError (or
+        OSError) if the image cannot be decoded (or read).
+        """
         print("\n=== FEATURE EXTRACTION ===")
+        image = as_decoded_image(image)
+        
+        cached = self._cache_lookup(image)
+        if cached is not None:
+            return cached
+        
+        # Undecodable images are an error, not an all-zero analysis
+        self.prepare(image)
         
         # Run extractors
-        objects = self.extract_objects(image_path)
-        text = self.extract_text(image_path)
-        blur_score = self.extract_blur_score(image_path)
+        if self._executor:
+            objects, text, blur_score = self._run_concurrently(image)
+        else:
+            objects = self.extract_objects(image)
+            text = self.extract_text(image)
+            blur_score = self.extract_blur_score(image)
+        
+        result = self._build_result(objects, text, blur_score)
+        self._cache_store(image, result)
+        return result
+    
+    def _cache_lookup(self, image):
+        """Return cached features for this image, or None (no cache, miss or error)."""
+        if not self.feature_cache:
+            return None
+        try:
+            cached = self.feature_cache.get(image, self.ocr_backend_name)
+        except Exception as e:
+            print(f"⚠  Feature cache lookup failed: {e}")
+            return None
+        if cached is not None:
+            METRICS.inc("feature_cache_hits")
+            print(f"  ✓ Feature cache hit for {image.name}")
+        else:
+            METRICS.inc("feature_cache_misses")
+        return cached
+    
+    def _cache_store(self, image, result):
+        # Results produced without OCR are incomplete; don't let them outlive this run
+        if not self.feature_cache or not self.tesseract_available:
+            return
+        try:
+            self.feature_cache.put(image, result, self.ocr_backend_name)
+        except Exception as e:
+            print(f"⚠  Feature cache store failed: {e}")
+    
+    def _run_concurrently(self, image):
+        """Overlap the three extractors; latency approaches the slowest one.
+        
+        Tesseract (in-process or CLI) and YOLO/OpenCV release the GIL in
+        their native code, so threads give real overlap. Each extractor keeps its own
+        error handling; anything that still escapes yields the same default the
+        extractor would have returned.
+        """
+        try:
+            # Decode and derive the grayscale levels up front so workers don't race to do it
+            self.prepare(image)
+            image.gray_at(Config.TEXT_DETECTION_MAX_SIDE)
+            if self.tesseract_available and self.find_text_regions(image) != []:
+                image.gray_at(Config.OCR_MAX_SIDE)
+        except Exception:
+            pass  # Each extractor reports the decode failure itself
+        
+        tasks = [
+            (self.extract_objects, []),
+            (self.extract_text, ""),
+            (self.extract_blur_score, 0.0),
+        ]
+        # Carry the caller's trace into the worker threads
+        futures = [(submit_in_context(self._executor, func, image), default) for func, default in tasks]
         
+        outputs = []
+        for future, default in futures:
+            try:
+                outputs.append(future.result())
+            except Exception as e:
+                print(f"⚠  Concurrent extractor failed: {e}")
+                outputs.append(default)
+        return outputs
+    
+    def close(self):
+        """Release the extractor thread pool and OCR engine, if they were started."""
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._ocr_backend is not None:
+            self._ocr_backend.close()
+    
+    def run_all_batch(self, images):
+        """Batched run_all: one YOLO call per Config.YOLO_BATCH_SIZE images.
+        
+        OCR and blur scoring still run per image. Returns one feature dict per
+        input, in input order, or None for an image that cannot be decoded.
+        """
+        print(f"\n=== FEATURE EXTRACTION (batch of {len(images)}) ===")
+        images = [as_decoded_image(image) for image in images]
+        results = [self._cache_lookup(image) for image in images]
+        pending = []
+        for index, cached in enumerate(results):
+            if cached is None:
+                try:
+                    self.prepare(images[index])
+                    pending.append(index)
+                except Exception as e:
+                    print(f"✗ Could not decode {images[index].name}: {e}")
+        all_objects = self.extract_objects_batch([images[index] for index in pending])
+        
+        for index, objects in zip(pending, all_objects):
+            image = images[index]
+            print(f"\n--- {image.name} ---")
+            text = self.extract_text(image)
+            blur_score = self.extract_blur_score(image)
+            results[index] = self._build_result(objects, text, blur_score)
+            self._cache_store(image, results[index])
+        return results
+    
+    def _build_result(self, objects, text, blur_score):
+        """Consolidate extractor outputs into the feature dict."""
         # Get top objects by confidence
         sorted_objects = sorted(objects, key=lambda x: x["confidence"], reverse=True)
         top_objects = [obj["object"] for obj in sorted_objects[:5]]  # Top 5 objects
@@ -0,0 +1,219 @@
+# image_io.py
+import hashlib
+import io
+import os
+import cv2
+import numpy as np
+from metrics import span
+
+# JPEG DCT-domain downscale factors OpenCV can decode at directly
+_REDUCED_DECODE_FLAGS = {
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+}
+
+
+class DecodedImage:
+    """An image that is read and decoded once and shared by every extractor.
+
+    The file is read on first access and decoded to a BGR ndarray (the layout
+    OpenCV and YOLO expect). RGB and grayscale views are derived lazily and
+    cached, so each extractor pays only for the views it actually uses.
+
+    Extractors that don't need full resolution ask for a pyramid level with
+    at_max_side()/gray_at(). prepare() decodes once, using JPEG DCT scaling,
+    at the coarsest size that still serves every level requested, so large
+    uploads are never fully decoded in color unless something asks for .bgr
+    (full_resolution_gray() decodes to grayscale only). Asking for a level
+    larger than that decode re-decodes at the size it needs.
+    """
+
+    def __init__(self, path=None, data=None, bgr=None, name=None):
+        if path is None and data is None and bgr is None:
+            raise ValueError("DecodedImage needs a path, encoded bytes or a BGR array")
+        self.path = path
+        self._name = name
+        self._data = data
+        self._bgr = bgr
+        self._rgb = None
+        self._gray = None
+        self._content_hash = None
+        self._size = None
+        self._base = None  # Reduced-resolution decode backing the pyramid
+        self._levels = {}
+        self._gray_levels = {}
+        # Memo of cheap measurements (e.g. blur score) so staged pipelines
+        # that look at an image more than once don't recompute them
+        self.derived = {}
+
+    @classmethod
+    def from_path(cls, image_path):
+        return cls(path=os.fspath(image_path))
+
+    @classmethod
+    def from_bytes(cls, data, name=None):
+        return cls(data=bytes(data), name=name)
+
+    @classmethod
+    def from_array(cls, bgr, name=None):
+        return cls(bgr=np.ascontiguousarray(bgr), name=name)
+
+    @property
+    def name(self):
+        return self._name or self.path or "<in-memory image>"
+
+    @property
+    def data(self):
+        """Encoded file bytes, read from disk on first access."""
+        if self._data is None:
+            if self.path is None:
+                raise ValueError("Image was created from pixels; no encoded bytes available")
+            with open(self.path, "rb") as f:
+                self._data = f.read()
+        return self._data
+
+    @property
+    def content_hash(self):
+        """SHA-256 of the encoded bytes (or raw pixels for in-memory arrays).
+
+        Hashing encoded bytes means cache lookups never need to decode.
+        """
+        if self._content_hash is None:
+            digest = hashlib.sha256()
+            if self._data is not None or self.path is not None:
+                digest.update(self.data)
+            else:
+                digest.update(str(self._bgr.shape).encode())
+                digest.update(self._bgr.tobytes())
+            self._content_hash = digest.hexdigest()
+        return self._content_hash
+
+    @property
+    def bgr(self):
+        """Full-resolution BGR pixels (decoded once)."""
+        if self._bgr is None:
+            buffer = np.frombuffer(self.data, dtype=np.uint8)
+            with span("decode"):
+                image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+            if image is None:
+                raise ValueError(f"Could not decode image: {self.name}")
+            self._bgr = image
+        return self._bgr
+
+    @property
+    def size(self):
+        """(width, height) at full resolution, read from the header without decoding."""
+        if self._size is None:
+            if self._bgr is not None:
+                height, width = self._bgr.shape[:2]
+                self._size = (width, height)
+            else:
+                from PIL import Image
+                try:
+                    with Image.open(io.BytesIO(self.data)) as header:
+                        self._size = header.size
+                except Exception:
+                    height, width = self.bgr.shape[:2]
+                    self._size = (width, height)
+        return self._size
+
+    def prepare(self, max_sides):
+        """Decode once at the coarsest resolution that serves every max side listed.
+
+        None in max_sides means full resolution is needed.
+        """
+        if self._bgr is not None or self._base is not None:
+            return
+        max_sides = list(max_sides)
+        if not max_sides or None in max_sides:
+            self.bgr
+        else:
+            self._decode_base(max(max_sides))
+
+    def _decode_base(self, max_side):
+        longest = max(self.size)
+        for factor, flag in _REDUCED_DECODE_FLAGS.items():
+            if longest / factor >= max_side:
+                buffer = np.frombuffer(self.data, dtype=np.uint8)
+                with span("decode"):
+                    image = cv2.imdecode(buffer, flag)
+                if image is None:
+                    raise ValueError(f"Could not decode image: {self.name}")
+                self._base = image
+                return
+        self._base = self.bgr
+
+    def at_max_side(self, max_side):
+        """BGR pixels with the longest side at most max_side (never upscaled).
+
+        Levels are resized with INTER_AREA from the smallest available decode
+        and cached. max_side=None returns full resolution.
+        """
+        if max_side is None:
+            return self.bgr
+        level = self._levels.get(max_side)
+        if level is None:
+            base = self._bgr if self._bgr is not None else self._base
+            if base is None or max(base.shape[:2]) < min(max_side, max(self.size)):
+                self._decode_base(max_side)
+                base = self._bgr if self._bgr is not None else self._base
+            height, width = base.shape[:2]
+            scale = max_side / max(height, width)
+            if scale >= 1:
+                level = base
+            else:
+                new_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+                level = cv2.resize(base, new_size, interpolation=cv2.INTER_AREA)
+            self._levels[max_side] = level
+        return level
+
+    def gray_at(self, max_side):
+        """Grayscale view of at_max_side(max_side)."""
+        if max_side is None:
+            return self.gray
+        gray = self._gray_levels.get(max_side)
+        if gray is None:
+            gray = cv2.cvtColor(self.at_max_side(max_side), cv2.COLOR_BGR2GRAY)
+            self._gray_levels[max_side] = gray
+        return gray
+
+    def full_resolution_gray(self):
+        """Full-resolution grayscale pixels, without keeping a full-resolution decode.
+
+        Reuses .gray or a full-size decode if there is one; otherwise the image
+        is decoded straight to grayscale and the result is not cached.
+        """
+        if self._gray is not None:
+            return self._gray
+        if self._bgr is not None or (self._base is not None and max(self._base.shape[:2]) >= max(self.size)):
+            return self.gray_at(max(self.size))
+        buffer = np.frombuffer(self.data, dtype=np.uint8)
+        with span("decode"):
+            gray = cv2.imdecode(buffer, cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            raise ValueError(f"Could not decode image: {self.name}")
+        return gray
+
+    @property
+    def rgb(self):
+        if self._rgb is None:
+            self._rgb = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2RGB)
+        return self._rgb
+
+    @property
+    def gray(self):
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY)
+        return self._gray
+
+    @property
+    def shape(self):
+        return self.bgr.shape
+
+
+def as_decoded_image(image):
+    """Accept a DecodedImage or a file path (kept for compatibility)."""
+    if isinstance(image, DecodedImage):
+        return image
+    return DecodedImage.from_path(image)
@@ -0,0 +1,122 @@
+# llm_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from config import Config
+
+
+class LLMResponseCache:
+    """Two-tier cache of parsed LLM responses keyed on provider, model and prompt.
+
+    The in-memory tier is a bounded LRU; the optional on-disk tier (SQLite)
+    survives restarts. Both honour the same TTL. Values are stored as JSON
+    and decoded fresh on every hit, so callers can mutate what they get back
+    without corrupting the cache.
+
+    Any object with the same get/put signature can be passed to LLMReasoner
+    instead.
+    """
+
+    def __init__(self, max_entries=None, ttl_seconds=None, disk_path=None, bypass=None):
+        self.max_entries = max_entries if max_entries is not None else Config.LLM_CACHE_MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else Config.LLM_CACHE_TTL_SECONDS
+        self.disk_path = disk_path if disk_path is not None else Config.LLM_CACHE_PATH
+        # Bypass skips lookups (forcing a fresh call) but still records new answers
+        self.bypass = Config.LLM_CACHE_BYPASS if bypass is None else bypass
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+
+    @staticmethod
+    def make_key(provider, model, prompt):
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return f"{provider}:{model}:{prompt_hash}"
+
+    def _expired(self, created_at):
+        return self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds
+
+    def _connection(self):
+        # SQLite connections must not cross fork(); reopen in child processes
+        if self._conn is None or self._conn_pid != os.getpid():
+            directory = os.path.dirname(self.disk_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.disk_path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.commit()
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def get(self, provider, model, prompt):
+        """Return a fresh copy of the cached result, or None."""
+        if self.bypass:
+            return None
+        key = self.make_key(provider, model, prompt)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if not self._expired(created_at):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return json.loads(value)
+                del self._memory[key]
+
+            if self.disk_path:
+                row = self._connection().execute(
+                    "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and not self._expired(row[1]):
+                    self._remember(key, row[0], row[1])
+                    self.hits += 1
+                    return json.loads(row[0])
+
+            self.misses += 1
+            return None
+
+    def put(self, provider, model, prompt, result):
+        """Store a parsed LLM result. Failed calls (None) are never cached."""
+        if result is None:
+            return
+        key = self.make_key(provider, model, prompt)
+        value = json.dumps(result)
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, value, created_at)
+            if self.disk_path:
+                conn = self._connection()
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, created_at) VALUES (?, ?, ?)",
+                    (key, value, created_at),
+                )
+                if self.ttl_seconds is not None:
+                    conn.execute("DELETE FROM responses WHERE created_at < ?", (created_at - self.ttl_seconds,))
+                conn.commit()
+
+    def _remember(self, key, value, created_at):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_enabled": bool(self.disk_path),
+        }
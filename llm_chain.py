@@ -0,0 +1,381 @@
+# llm_chain.py
+import asyncio
+import json
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from config import Config
+from llm_providers import LLMProvider
+from metrics import METRICS
+
+
+class ProvidersUnavailable(Exception):
+    """Every provider in the chain is failing or has its circuit open."""
+
+
+class InvalidReply(Exception):
+    """A provider answered, but with nothing that parses as an analysis."""
+
+
+def is_valid_reply(text):
+    """True when the reply holds a JSON object (fenced or embedded in prose is fine)."""
+    if not text or not text.strip():
+        return False
+    text = text.strip().replace('```json', '').replace('```', '').strip()
+    try:
+        return isinstance(json.loads(text), (dict, list))
+    except json.JSONDecodeError:
+        match = re.search(r'\{.*\}', text, re.DOTALL)
+        if not match:
+            return False
+        try:
+            json.loads(match.group())
+            return True
+        except json.JSONDecodeError:
+            return False
+
+
+class CircuitBreaker:
+    """Per-provider breaker driven by error rate and slow-call rate.
+
+    Closed: calls go through and outcomes fill a rolling window. Once the
+    window holds min_calls outcomes and either rate reaches its threshold,
+    the breaker opens and the provider is skipped for cooldown seconds. Then
+    one probe call is let through (half-open): success closes the breaker,
+    a failure or slow call opens it again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name, window=None, min_calls=None, error_rate=None, slow_call_seconds=None,
+                 slow_call_rate=None, cooldown=None, clock=time.monotonic):
+        self.name = name
+        self.min_calls = min_calls or Config.LLM_BREAKER_MIN_CALLS
+        self.error_rate = error_rate or Config.LLM_BREAKER_ERROR_RATE
+        self.slow_call_seconds = slow_call_seconds or Config.LLM_BREAKER_SLOW_CALL_SECONDS
+        self.slow_call_rate = slow_call_rate or Config.LLM_BREAKER_SLOW_CALL_RATE
+        self.cooldown = Config.LLM_BREAKER_COOLDOWN_SECONDS if cooldown is None else cooldown
+        self.clock = clock
+        self.state = self.CLOSED
+        self.opened = 0
+        self._outcomes = deque(maxlen=window or Config.LLM_BREAKER_WINDOW)  # (failed, slow)
+        self._latencies = deque(maxlen=256)  # Successful call durations, for the hedge delay
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go to this provider now (claims the probe when half-open)."""
+        with self._lock:
+            if self.state == self.OPEN and self.clock() - self._opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    return False
+                self._probe_in_flight = True
+                return True
+            return self.state == self.CLOSED
+
+    def record_success(self, latency):
+        with self._lock:
+            self._latencies.append(latency)
+            self._record(False, latency >= self.slow_call_seconds)
+
+    def record_failure(self):
+        with self._lock:
+            self._record(True, False)
+
+    def record_abandoned(self):
+        """The first provider's call, cancelled because the hedged request beat it, counts as slow."""
+        with self._lock:
+            self._record(False, True)
+
+    def record_cancelled(self):
+        """A call cancelled after its outcome was settled elsewhere: a claimed probe is released."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probe_in_flight = False
+
+    def _record(self, failed, slow):
+        if self.state == self.OPEN:
+            return  # Late outcome of a call made before the breaker opened
+        if self.state == self.HALF_OPEN:
+            self._probe_in_flight = False
+            if failed or slow:
+                self._trip("probe failed")
+            else:
+                self.state = self.CLOSED
+                self._outcomes.clear()
+                print(f"  ✓ {self.name} circuit closed")
+            return
+
+        self._outcomes.append((failed, slow))
+        calls = len(self._outcomes)
+        if calls < self.min_calls:
+            return
+        failures = sum(1 for f, _ in self._outcomes if f)
+        slow_calls = sum(1 for _, s in self._outcomes if s)
+        if failures / calls >= self.error_rate:
+            self._trip(f"{failures}/{calls} calls failed")
+        elif slow_calls / calls >= self.slow_call_rate:
+            self._trip(f"{slow_calls}/{calls} calls slow")
+
+    def _trip(self, reason):
+        self.state = self.OPEN
+        self.opened += 1
+        self._opened_at = self.clock()
+        self._outcomes.clear()
+        METRICS.inc("llm_breaker_opened")
+        print(f"  ⚠  {self.name} circuit open ({reason}); skipping it for {self.cooldown:.0f}s")
+
+    def p95(self):
+        """95th percentile of recent successful call latency, or None with too few samples."""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < self.min_calls:
+            return None
+        return samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+
+    def stats(self):
+        p95 = self.p95()
+        with self._lock:
+            return {
+                "state": self.state,
+                "opened": self.opened,
+                "window_calls": len(self._outcomes),
+                "window_failures": sum(1 for f, _ in self._outcomes if f),
+                "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            }
+
+
+class ProviderChain(LLMProvider):
+    """Ordered providers behind circuit breakers, used as a single LLMProvider.
+
+    Each request goes to the first provider whose breaker allows it, and
+    fails over down the chain on errors or unusable replies. With hedging,
+    if the first provider has not answered after its recent p95 latency, the
+    same prompt also goes to the next one and the first valid reply wins.
+    When every provider fails or is open, ProvidersUnavailable (or the last
+    error) is raised and LLMReasoner falls back to the rules.
+    """
+
+    name = "chain"
+    strict_json = False  # Members differ; replies are parsed leniently
+    bounds_own_timeout = True  # Each member call gets the timeout; failover needs room beyond it
+
+    def __init__(self, providers, hedging=None, breakers=None, executor_workers=32):
+        if not providers:
+            raise ValueError("ProviderChain needs at least one provider")
+        self.providers = list(providers)
+        self.name = ">".join(provider.name for provider in self.providers)
+        self.hedging = Config.LLM_HEDGING_ENABLED if hedging is None else hedging
+        self.breakers = breakers or [CircuitBreaker(provider.name) for provider in self.providers]
+        self._executor_workers = executor_workers
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    @property
+    def model(self):
+        # Read through: members may switch models on first use
+        return ">".join(f"{provider.name}:{provider.model}" for provider in self.providers)
+
+    @property
+    def confirmed(self):
+        return all(provider.confirmed for provider in self.providers)
+
+    def validate(self):
+        results = [provider.validate() for provider in self.providers]
+        return any(results)
+
+    def hedge_delay(self, index):
+        """How long to wait on providers[index] before hedging to the next one."""
+        p95 = self.breakers[index].p95()
+        if p95 is None:
+            return Config.LLM_HEDGE_DEFAULT_DELAY_SECONDS
+        return max(Config.LLM_HEDGE_MIN_DELAY_SECONDS, p95)
+
+    def stats(self):
+        return {provider.name: breaker.stats() for provider, breaker in zip(self.providers, self.breakers)}
+
+    def _next(self, start):
+        """First provider index at or after start whose breaker lets a call through, or None."""
+        for index in range(start, len(self.providers)):
+            if self.breakers[index].allow():
+                return index
+            METRICS.inc("llm_breaker_rejections")
+        return None
+
+    def _check(self, index, text, started):
+        breaker = self.breakers[index]
+        if not is_valid_reply(text):
+            breaker.record_failure()
+            raise InvalidReply(f"{self.providers[index].name} returned no usable JSON")
+        breaker.record_success(time.monotonic() - started)
+        return text
+
+    def _call(self, index, prompt, timeout):
+        started = time.monotonic()
+        try:
+            text = self.providers[index].generate(prompt, timeout=timeout)
+        except Exception:
+            self.breakers[index].record_failure()
+            raise
+        return self._check(index, text, started)
+
+    async def _acall(self, index, prompt, timeout):
+        started = time.monotonic()
+        try:
+            call = self.providers[index].agenerate(prompt, timeout=timeout)
+            # Enforced here, not only by the provider, so a hung member times
+            # out (and counts as failed) in time for the chain to fail over
+            text = await (asyncio.wait_for(call, timeout) if timeout else call)
+        except asyncio.CancelledError:
+            # agenerate has already charged (or deliberately not charged) this call
+            self.breakers[index].record_cancelled()
+            raise
+        except Exception:
+            self.breakers[index].record_failure()
+            raise
+        return self._check(index, text, started)
+
+    def _won(self, index, first, hedged=False):
+        if index != first:
+            METRICS.inc("llm_hedge_wins" if hedged else "llm_failovers")
+            print(f"  ↪ Answered by {self.providers[index].name}")
+
+    def _failed(self, index, error):
+        print(f"  ⚠  {self.providers[index].name} failed: {type(error).__name__}: {str(error)[:80]}")
+
+    def _pool(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._executor_workers,
+                                                    thread_name_prefix="llm-chain")
+            return self._executor
+
+    def generate(self, prompt, timeout=None):
+        first = self._next(0)
+        if first is None:
+            raise ProvidersUnavailable(f"no provider available in {self.name}")
+        if not self.hedging:
+            index, error = first, None
+            while index is not None:
+                try:
+                    text = self._call(index, prompt, timeout)
+                except Exception as e:
+                    self._failed(index, e)
+                    error = e
+                    index = self._next(index + 1)
+                    continue
+                self._won(index, first)
+                return text
+            raise error
+
+        # Hedged: a request that loses the race keeps running in its worker
+        # thread and still reports its outcome to its breaker
+        pool = self._pool()
+        pending = {pool.submit(self._call, first, prompt, timeout): first}
+        cursor = first + 1
+        hedged = False
+        error = None
+        while pending:
+            delay = self.hedge_delay(first) if not hedged and cursor < len(self.providers) else None
+            done, _ = wait(pending, timeout=delay, return_when=FIRST_COMPLETED)
+            if not done:
+                hedged = True
+                index = self._next(cursor)
+                if index is not None:
+                    METRICS.inc("llm_hedged_requests")
+                    pending[pool.submit(self._call, index, prompt, timeout)] = index
+                    cursor = index + 1
+                continue
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    text = future.result()
+                except Exception as e:
+                    self._failed(index, e)
+                    error = e
+                    continue
+                self._won(index, first, hedged)
+                return text
+            if not pending:
+                index = self._next(cursor)
+                if index is not None:
+                    pending[pool.submit(self._call, index, prompt, timeout)] = index
+                    cursor = index + 1
+        raise error
+
+    async def agenerate(self, prompt, timeout=None):
+        first = self._next(0)
+        if first is None:
+            raise ProvidersUnavailable(f"no provider available in {self.name}")
+        pending = {asyncio.ensure_future(self._acall(first, prompt, timeout)): first}
+        cursor = first + 1
+        hedged = False
+        error = None
+        winner = None
+        try:
+            while pending:
+                hedge = self.hedging and not hedged and cursor < len(self.providers)
+                done, _ = await asyncio.wait(pending, timeout=self.hedge_delay(first) if hedge else None,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    index = self._next(cursor)
+                    if index is not None:
+                        METRICS.inc("llm_hedged_requests")
+                        pending[asyncio.ensure_future(self._acall(index, prompt, timeout))] = index
+                        cursor = index + 1
+                    continue
+                for task in done:
+                    index = pending.pop(task)
+                    try:
+                        text = task.result()
+                    except Exception as e:
+                        self._failed(index, e)
+                        error = e
+                        continue
+                    self._won(index, first, hedged)
+                    winner = index
+                    return text
+                if not pending:
+                    index = self._next(cursor)
+                    if index is not None:
+                        pending[asyncio.ensure_future(self._acall(index, prompt, timeout))] = index
+                        cursor = index + 1
+            raise error
+        finally:
+            # Requests still running are cancelled. With a winner, only the
+            # first provider is charged (as slow), and only when the hedged
+            # request beat it; a cancelled hedge that lost the race records
+            # nothing. Without one, the caller gave up on us: every call still
+            # running failed to answer in time.
+            if winner is None:
+                for index in pending.values():
+                    self.breakers[index].record_failure()
+            elif winner != first and first in pending.values():
+                self.breakers[first].record_abandoned()
+            for task in pending:
+                task.cancel()
+
+
+def create_provider_chain(names, create):
+    """ProviderChain over the names that can be configured here (None if none can).
+
+    "rules"/"fallback" entries just mark the end of the chain: the rule-based
+    analysis is always what runs when every provider fails.
+    """
+    providers = []
+    for name in names:
+        name = name.strip().lower()
+        if name in ("rules", "fallback"):
+            break
+        try:
+            providers.append(create(name))
+        except Exception as e:
+            print(f"⚠  {name} left out of the provider chain: {e}")
+    return ProviderChain(providers) if providers else None
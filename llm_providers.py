@@ -0,0 +1,349 @@
+# llm_providers.py
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from config import Config
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token for English prompts)."""
+    return max(1, len(text) // 4)
+
+
+class LLMHTTPError(Exception):
+    """Provider error carrying an HTTP status code (used by fakes and tests)."""
+
+    def __init__(self, status_code, message=""):
+        super().__init__(message or f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def status_code_of(error):
+    """Best-effort HTTP status of an SDK exception (OpenAI: status_code, Google: code)."""
+    for attr in ("status_code", "code"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_retryable(error):
+    """True for rate limits, server errors, timeouts and dropped connections."""
+    status = status_code_of(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError", "ServiceUnavailable", "DeadlineExceeded")
+
+
+def is_model_not_found(error):
+    status = status_code_of(error)
+    message = str(error).lower()
+    return status == 404 or type(error).__name__ == "NotFound" or ("model" in message and "not found" in message)
+
+
+_model_state_lock = threading.Lock()
+
+
+def load_known_good_model(provider_name, configured_model):
+    """Model recorded as working for this provider, if Config still asks for the same one."""
+    try:
+        with open(Config.LLM_MODEL_STATE_PATH) as f:
+            entry = json.load(f).get(provider_name) or {}
+    except (OSError, ValueError):
+        return None
+    if entry.get("configured") != configured_model:
+        return None
+    return entry.get("model")
+
+
+def save_known_good_model(provider_name, configured_model, model):
+    """Persist the working model so later processes skip validation entirely."""
+    path = Config.LLM_MODEL_STATE_PATH
+    with _model_state_lock:
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        state[provider_name] = {"configured": configured_model, "model": model, "validated_at": time.time()}
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(state, f, indent=2)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"  ⚠  Could not record known-good model: {e}")
+
+
+class LLMProvider:
+    """A text-in/text-out LLM backend with blocking and asyncio entry points.
+
+    Subclasses implement generate(); agenerate() defaults to running it in a
+    worker thread. strict_json selects how LLMReasoner parses the reply.
+    bounds_own_timeout marks providers that apply `timeout` per underlying
+    call themselves and may legitimately take longer in total (a chain
+    failing over), so callers must not cut them off at `timeout`.
+    Construction must stay free of network calls; validate() is the explicit
+    health check.
+    """
+
+    name = "base"
+    strict_json = False
+    bounds_own_timeout = False
+    client = None
+    confirmed = True
+
+    def __init__(self, model):
+        self.model = model
+
+    def generate(self, prompt, timeout=None):
+        raise NotImplementedError
+
+    async def agenerate(self, prompt, timeout=None):
+        return await asyncio.to_thread(self.generate, prompt, timeout)
+
+    def validate(self):
+        try:
+            self.generate("Hello", timeout=Config.LLM_TIMEOUT_SECONDS)
+            return True
+        except Exception as e:
+            print(f"    {self.name} ({self.model}) failed: {str(e)[:80]}...")
+            return False
+
+
+class OpenAIProvider(LLMProvider):
+    name = "openai"
+    strict_json = True  # response_format=json_object guarantees JSON
+
+    def __init__(self, api_key, model):
+        super().__init__(model)
+        self.api_key = api_key
+        self._client = None
+        self._async_client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI(api_key=self.api_key)
+        return self._client
+
+    def validate(self):
+        try:
+            self.client.models.retrieve(self.model)
+            return True
+        except Exception as e:
+            print(f"    Model {self.model} failed: {str(e)[:80]}...")
+            return False
+
+    def _request(self, prompt):
+        return dict(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.1,
+            response_format={"type": "json_object"},
+        )
+
+    def generate(self, prompt, timeout=None):
+        response = self.client.chat.completions.create(timeout=timeout, **self._request(prompt))
+        return response.choices[0].message.content
+
+    async def agenerate(self, prompt, timeout=None):
+        if self._async_client is None:
+            from openai import AsyncOpenAI
+            self._async_client = AsyncOpenAI(api_key=self.api_key)
+        response = await self._async_client.chat.completions.create(timeout=timeout, **self._request(prompt))
+        return response.choices[0].message.content
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini, constructed lazily with no startup probing.
+
+    A "model not found" error moves on to the next fallback model. The first
+    success (or a success after switching models) is recorded with
+    save_known_good_model, so restarts start confirmed and never probe.
+    """
+
+    name = "gemini"
+
+    def __init__(self, api_key, model, fallback_models=(), confirmed=False, configured_model=None):
+        super().__init__(model)
+        self.api_key = api_key
+        self.configured_model = configured_model or model
+        self.fallback_models = [name for name in fallback_models if name != model]
+        self.confirmed = confirmed
+        self._recorded_model = model if confirmed else None
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            import google.generativeai as genai
+            genai.configure(api_key=self.api_key)
+            self._client = genai.GenerativeModel(self.model)
+        return self._client
+
+    @staticmethod
+    def _options(timeout):
+        return {"timeout": timeout} if timeout else None
+
+    def _confirm(self):
+        self.confirmed = True
+        if self._recorded_model != self.model:
+            self._recorded_model = self.model
+            save_known_good_model(self.name, self.configured_model, self.model)
+
+    def _next_model(self, failed_model, error):
+        """Switch to the next fallback after a model-not-found error; False if none is left."""
+        if not is_model_not_found(error):
+            return False
+        with self._lock:
+            if self.model != failed_model:
+                return True  # Another request already moved on
+            if not self.fallback_models:
+                return False
+            print(f"    Model {failed_model} unavailable, trying {self.fallback_models[0]}")
+            self.model = self.fallback_models.pop(0)
+            self._client = None
+            return True
+
+    def generate(self, prompt, timeout=None):
+        while True:
+            model = self.model
+            try:
+                response = self.client.generate_content(prompt, request_options=self._options(timeout))
+                text = response.text
+            except Exception as e:
+                if self._next_model(model, e):
+                    continue
+                raise
+            self._confirm()
+            return text
+
+    async def agenerate(self, prompt, timeout=None):
+        while True:
+            model = self.model
+            try:
+                response = await self.client.generate_content_async(prompt, request_options=self._options(timeout))
+                text = response.text
+            except Exception as e:
+                if self._next_model(model, e):
+                    continue
+                raise
+            self._confirm()
+            return text
+
+    def validate(self):
+        """Probe the configured and fallback models (and list_models as a last resort)."""
+        for model_name in [self.model] + list(self.fallback_models):
+            print(f"  Trying model: {model_name}")
+            self.model, self._client = model_name, None
+            try:
+                self.client.generate_content("Hello", request_options=self._options(Config.LLM_TIMEOUT_SECONDS))
+            except Exception as e:
+                print(f"    Model {model_name} failed: {str(e)[:80]}...")
+                continue
+            self._confirm()
+            return True
+
+        # If none worked, try listing and using first available
+        import google.generativeai as genai
+        print("  Listing all available models...")
+        for model in genai.list_models():
+            if 'generateContent' in model.supported_generation_methods:
+                print(f"  Available for generateContent: {model.name}")
+                self.model, self._client = model.name, None
+                self._confirm()
+                return True
+        return False
+
+
+class FakeProvider(LLMProvider):
+    """Deterministic in-process provider for tests, benchmarks and local runs.
+
+    responder(prompt) -> str builds the reply (default: a stable JSON verdict
+    derived from the prompt hash). failures is an optional list of exceptions
+    raised, in order, by the first calls. latency is seconds per call, or a
+    callable returning them (e.g. to simulate a brownout); name tells fakes
+    apart in a ProviderChain.
+    """
+
+    name = "fake"
+    strict_json = True
+
+    def __init__(self, model="fake-llm", responder=None, latency=0.0, failures=None, name=None):
+        super().__init__(model)
+        if name:
+            self.name = name
+        self.responder = responder or self.default_response
+        self.latency = latency
+        self.failures = list(failures or [])
+        self.calls = 0
+
+    @staticmethod
+    def default_response(prompt):
+        digest = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8], 16)
+        score = round(0.5 + (digest % 40) / 100, 2)
+        return json.dumps({
+            "image_quality_score": score,
+            "issues_detected": [] if score >= 0.7 else ["background clutter"],
+            "detected_objects": [],
+            "text_detected": [],
+            "llm_reasoning_summary": "Deterministic fake provider response.",
+            "final_verdict": "Suitable for professional e-commerce use" if score >= 0.7
+                             else "Not suitable for professional e-commerce use",
+            "confidence": 0.8,
+        })
+
+    def _next(self, prompt):
+        self.calls += 1
+        if self.failures:
+            raise self.failures.pop(0)
+        return self.responder(prompt)
+
+    def _latency(self):
+        return self.latency() if callable(self.latency) else self.latency
+
+    def generate(self, prompt, timeout=None):
+        latency = self._latency()
+        if latency:
+            time.sleep(latency)
+        return self._next(prompt)
+
+    async def agenerate(self, prompt, timeout=None):
+        latency = self._latency()
+        if latency:
+            await asyncio.sleep(latency)
+        return self._next(prompt)
+
+
+def create_provider(name):
+    """Build the provider named in Config (raises if it cannot be configured)."""
+    name = name.lower()
+    if name == "openai":
+        if not Config.OPENAI_API_KEY:
+            raise ValueError("OPENAI_API_KEY not found")
+        return OpenAIProvider(Config.OPENAI_API_KEY, Config.OPENAI_MODEL)
+    if name == "gemini":
+        if not Config.GEMINI_API_KEY:
+            raise ValueError("GEMINI_API_KEY not found. Please add GEMINI_API_KEY to your .env file")
+        known_good = load_known_good_model("gemini", Config.GEMINI_MODEL)
+        return GeminiProvider(
+            Config.GEMINI_API_KEY,
+            known_good or Config.GEMINI_MODEL,
+            fallback_models=Config.GEMINI_FALLBACK_MODELS,
+            confirmed=known_good is not None,
+            configured_model=Config.GEMINI_MODEL,
+        )
+    if name == "fake":
+        return FakeProvider()
+    raise ValueError(f"Unknown LLM provider: {name}")
@@ -1,12 +1,66 @@
+import asyncio
 import json
 import re
 from config import Config
+from llm_cache import LLMResponseCache
+from llm_chain import create_provider_chain
+from llm_providers import create_provider, estimate_tokens
+from llm_routing import NO_LLM_PROVIDER, LLMRoutingPolicy, routing_info
+from metrics import METRICS, span
+from prompt_encoding import encode_features
+from rule_engine import LLM_CASUAL_TEXT_MATCHER, PERSONAL_ITEM_MATCHER, RuleEngine
+
+PROMPT_CRITERIA = """CRITERIA FOR E-COMMERCE PRODUCT IMAGES:
+1. Professional: Clean background, good lighting, no personal items
+2. Product-focused: Product should be main subject
+3. High quality: Sharp, well-lit, no clutter
+4. Brand-appropriate: Minimal/no casual text
+
+IMPORTANT: Be strict about personal items (person, bed, furniture, food) - these make images unsuitable for professional e-commerce.
+
+ANALYSIS TASK:
+1. Score image quality 0-1 (be realistic, not overly generous)
+2. List any issues found (be specific)
+3. Provide final verdict
+4. Explain reasoning briefly"""
+
+PROMPT_OUTPUT_EXAMPLE = """{
+    "image_quality_score": 0.85,
+    "issues_detected": ["issue1", "issue2"],
+    "detected_objects": ["object1", "object2"],
+    "text_detected": [],
+    "llm_reasoning_summary": "Brief explanation...",
+    "final_verdict": "Suitable for professional e-commerce use",
+    "confidence": 0.8
+}"""
 
 class LLMReasoner:
-    def __init__(self):
-        self.provider = Config.LLM_PROVIDER.lower()
-        self.client = None
-        self.model = None
+    def __init__(self, response_cache=None, llm_provider=None, provider_name=None):
+        # provider_name overrides Config.LLM_PROVIDER ("fallback" = rules only, no SDK imports)
+        self.provider = (provider_name or Config.LLM_PROVIDER).lower()
+        self.llm_provider = None  # LLMProvider used for every call (sync and async)
+        self._async_client = None
+        
+        # Pluggable response cache: anything with get(provider, model, prompt) / put(..., result)
+        if response_cache is None and Config.LLM_CACHE_ENABLED:
+            response_cache = LLMResponseCache()
+        self.response_cache = response_cache
+        
+        # Compiled keyword matchers and weights for the rule-based analysis
+        self.rule_engine = RuleEngine()
+        # Which images need the LLM at all (every one unless Config.LLM_ROUTING_ENABLED)
+        self.routing_policy = LLMRoutingPolicy()
+        self._features_budget = None  # Prompt tokens left for features, computed on first prompt
+        
+        if llm_provider is not None:
+            # Injected provider (e.g. FakeProvider in tests and benchmarks)
+            self._use_provider(llm_provider)
+            print(f"✓ LLM: {self.provider} ({self.model})")
+            return
+        
+        if provider_name is None and Config.LLM_PROVIDER_CHAIN:
+            self._init_chain(Config.LLM_PROVIDER_CHAIN)
+            return
         
         print(f"Initializing LLM Reasoner with provider: {self.provider}")
         
@@ -17,124 +71,472 @@ class LLMReasoner:
         else:
             print("⚠  Using rule-based analysis only")
     
+    @property
+    def model(self):
+        # Read through: the provider may switch to a fallback model on first use
+        return self.llm_provider.model if self.llm_provider else None
+    
+    @property
+    def client(self):
+        """Underlying SDK client (constructed on first access)."""
+        return self.llm_provider.client if self.llm_provider else None
+    
     def _init_openai(self):
-        """Initialize OpenAI client."""
+        """Configure OpenAI (no network calls; the client is built on first use)."""
         try:
-            from openai import OpenAI
-            if not Config.OPENAI_API_KEY:
-                raise ValueError("OPENAI_API_KEY not found")
-            self.client = OpenAI(api_key=Config.OPENAI_API_KEY)
-            self.model = Config.OPENAI_MODEL
+            self._use_provider(create_provider("openai"))
             print(f"✓ LLM: OpenAI ({self.model})")
         except Exception as e:
             print(f"⚠  OpenAI init failed: {e}")
     
     def _init_gemini(self):
-        """Initialize Google Gemini client."""
-        try:
-            import google.generativeai as genai
-            if not Config.GEMINI_API_KEY:
-                raise ValueError("GEMINI_API_KEY not found. Please add GEMINI_API_KEY to your .env file")
-            
-            genai.configure(api_key=Config.GEMINI_API_KEY)
-            
-            # Try different model names
-            model_names_to_try = [
-                "gemini-2.0-flash-latest",      # Latest stable
-                "gemini-2.0-flash",             # Alternative
-                "gemini-2.0-flash-001",         # Another alternative
-                "gemini-pro-latest",            # Pro version
-                "gemini-1.5-flash"              # Original (might not exist)
-            ]
-            
-            for model_name in model_names_to_try:
-                try:
-                    print(f"  Trying model: {model_name}")
-                    self.client = genai.GenerativeModel(model_name)
-                    # Test with a simple prompt to verify
-                    test_response = self.client.generate_content("Hello")
-                    self.model = model_name
-                    print(f"✓ LLM: Google Gemini ({self.model})")
-                    return
-                except Exception as model_error:
-                    print(f"    Model {model_name} failed: {str(model_error)[:80]}...")
-                    continue
-
-            # If none worked, try listing and using first available
-            print("  Listing all available models...")
-            models = genai.list_models()
-            for model in models:
-                if 'generateContent' in model.supported_generation_methods:
-                    print(f"  Available for generateContent: {model.name}")
-                    try:
-                        self.client = genai.GenerativeModel(model.name)
-                        self.model = model.name
-                        print(f"✓ LLM: Using available model {self.model}")
-                        return
-                    except:
-                        continue
-        
-            raise ValueError("No working Gemini model found")
+        """Configure Google Gemini without probing.
         
+        The last known-good model (if recorded) is used directly; otherwise the
+        first real request validates Config.GEMINI_MODEL and falls back through
+        Config.GEMINI_FALLBACK_MODELS. Use validate() for an explicit check.
+        """
+        try:
+            self._use_provider(create_provider("gemini"))
+            status = "known-good" if self.llm_provider.confirmed else "validated on first request"
+            print(f"✓ LLM: Google Gemini ({self.model}, {status})")
         except Exception as e:
             print(f"⚠  Gemini init failed: {e}")
             print("   Please check your API key at: https://aistudio.google.com/app/apikey")
     
+    def _init_chain(self, names):
+        """Configure an ordered provider chain with circuit breakers (and optional hedging)."""
+        print(f"Initializing LLM Reasoner with provider chain: {' > '.join(names)}")
+        chain = create_provider_chain(names, create_provider)
+        if chain is None:
+            self.provider = "fallback"
+            print("⚠  Using rule-based analysis only")
+            return
+        self._use_provider(chain)
+        hedging = ", hedged" if chain.hedging else ""
+        print(f"✓ LLM chain: {self.model} (circuit breakers{hedging}, rules last)")
+    
+    def _use_provider(self, llm_provider):
+        self.llm_provider = llm_provider
+        self.provider = llm_provider.name
+    
+    def validate(self):
+        """Explicit health check: make a real request and record the working model."""
+        if not self.llm_provider:
+            print("⚠  No LLM provider configured (rule-based analysis only)")
+            return False
+        print(f"Validating LLM provider: {self.provider} ({self.model})")
+        ok = self.llm_provider.validate()
+        if ok:
+            print(f"✓ LLM validated: {self.provider} ({self.model})")
+        else:
+            print(f"✗ LLM validation failed for provider: {self.provider}")
+        return ok
+    
     def analyze_features(self, image_path, features):
         """Hybrid analysis: LLM + rule-based validation."""
         
         print(f"\n[2/2] Reasoning over features...")
         
+        rule_result = self._rule_analysis(features)
+        routing = self._route(rule_result)
+        
         # Get LLM analysis
-        llm_result = self._get_llm_analysis(features) if self.client else None
+        llm_result, prompt_tokens = self._get_llm_analysis(features) if routing[0] else (None, 0)
         
+        return self._finish_analysis(llm_result, features, rule_result, routing, prompt_tokens)
+    
+    async def analyze_features_async(self, image_path, features):
+        """asyncio variant of analyze_features.
+        
+        The LLM call goes through AsyncLLMClient (bounded concurrency, rate
+        limits, timeouts, retries), so many images can be in flight at once.
+        """
+        rule_result = self._rule_analysis(features)
+        routing = self._route(rule_result)
+        llm_result, prompt_tokens = await self._get_llm_analysis_async(features) if routing[0] else (None, 0)
+        return self._finish_analysis(llm_result, features, rule_result, routing, prompt_tokens)
+    
+    async def analyze_batch_async(self, items):
+        """Analyze [(image_path, features), ...] concurrently; results keep input order."""
+        return await asyncio.gather(
+            *(self.analyze_features_async(image_path, features) for image_path, features in items)
+        )
+    
+    def analyze_many(self, items):
+        """Blocking wrapper around analyze_batch_async for synchronous callers."""
+        return asyncio.run(self.analyze_batch_async(items))
+    
+    def analyze_features_batch(self, items, batch_size=None):
+        """Analyze [(image_path, features), ...] with up to batch_size images per LLM request.
+        
+        Images are sent together in one prompt (criteria stated once) and the
+        reply is split back out by id. Any image whose element is missing or
+        invalid falls back to a single-image call. Results keep input order.
+        """
+        batch_size = batch_size or Config.LLM_BATCH_SIZE
+        rule_results, routings, routed = self._route_batch(items)
+        llm_results = [None] * len(items)
+        prompt_tokens = [0] * len(items)
+        for start in range(0, len(routed), batch_size):
+            chunk = routed[start:start + batch_size]
+            results, tokens = self._get_llm_batch_analysis([items[i][1] for i in chunk])
+            for index, result, sent in zip(chunk, results, tokens):
+                llm_results[index], prompt_tokens[index] = result, sent
+        return [self._finish_analysis(llm_result, features, rule_result, routing, sent)
+                for llm_result, (_, features), rule_result, routing, sent
+                in zip(llm_results, items, rule_results, routings, prompt_tokens)]
+    
+    async def analyze_features_batch_async(self, items, batch_size=None):
+        """asyncio variant of analyze_features_batch; chunks are requested concurrently."""
+        batch_size = batch_size or Config.LLM_BATCH_SIZE
+        rule_results, routings, routed = self._route_batch(items)
+        llm_results = [None] * len(items)
+        prompt_tokens = [0] * len(items)
+        chunks = [routed[start:start + batch_size] for start in range(0, len(routed), batch_size)]
+        replies = await asyncio.gather(
+            *(self._get_llm_batch_analysis_async([items[i][1] for i in chunk]) for chunk in chunks)
+        )
+        for chunk, (results, tokens) in zip(chunks, replies):
+            for index, result, sent in zip(chunk, results, tokens):
+                llm_results[index], prompt_tokens[index] = result, sent
+        return [self._finish_analysis(llm_result, features, rule_result, routing, sent)
+                for llm_result, (_, features), rule_result, routing, sent
+                in zip(llm_results, items, rule_results, routings, prompt_tokens)]
+    
+    def analyze_features_stream(self, image_path, features):
+        """Two-phase analysis: yield the rule-based verdict at once, then the final one.
+        
+        The first result (provisional=True) is ready before the LLM is called;
+        the second (provisional=False) is what analyze_features would return.
+        When the LLM is not called (no provider, or routed past it) there is
+        only the final result.
+        """
+        rule_result = self._rule_analysis(features)
+        routing = self._route(rule_result)
+        if not routing[0]:
+            yield self._finish_analysis(None, features, rule_result, routing)
+            return
+        yield self._provisional_result(rule_result)
+        llm_result, prompt_tokens = self._get_llm_analysis(features)
+        yield self._finish_analysis(llm_result, features, rule_result, routing, prompt_tokens)
+    
+    async def analyze_features_stream_async(self, image_path, features):
+        """Async-generator variant of analyze_features_stream."""
+        rule_result = self._rule_analysis(features)
+        routing = self._route(rule_result)
+        if not routing[0]:
+            yield self._finish_analysis(None, features, rule_result, routing)
+            return
+        yield self._provisional_result(rule_result)
+        llm_result, prompt_tokens = await self._get_llm_analysis_async(features)
+        yield self._finish_analysis(llm_result, features, rule_result, routing, prompt_tokens)
+    
+    def analyze_features_with_callback(self, image_path, features, on_result):
+        """Callback form of analyze_features_stream: on_result(result) per phase; returns the final result."""
+        for result in self.analyze_features_stream(image_path, features):
+            on_result(result)
+        return result
+    
+    def _rule_analysis(self, features):
+        with span("rules"):
+            return self._enhanced_fallback_analysis(features)
+    
+    def _route(self, rule_result):
+        """(call_llm, reason) for one image; see llm_routing.LLMRoutingPolicy."""
+        if not self.llm_provider:
+            return False, NO_LLM_PROVIDER
+        call_llm, reason = self.routing_policy.decide(rule_result)
+        if not call_llm:
+            print(f"  LLM skipped ({reason.replace('_', ' ')})")
+        return call_llm, reason
+    
+    def _route_batch(self, items):
+        """Rule results, routing decisions and the indexes that go to the LLM, for a batch."""
+        with span("rules"):
+            rule_scores = self.rule_engine.score([features for _, features in items])
+            rule_results = list(rule_scores.results([features for _, features in items]))
+        routings = [self._route(rule_result) for rule_result in rule_results]
+        routed = [index for index, (call_llm, _) in enumerate(routings) if call_llm]
+        return rule_results, routings, routed
+    
+    def _provisional_result(self, rule_result):
+        return {
+            **rule_result,
+            "analysis_method": "rule-based",
+            "rule_score": rule_result.get('image_quality_score', 'N/A'),
+            "provisional": True,
+        }
+    
+    def _finish_analysis(self, llm_result, features, rule_result=None, routing=None, prompt_tokens=None):
+        """Rule-based pass, blending and metadata shared by the sync and async paths.
+        
+        prompt_tokens is the estimate for the prompt(s) actually sent for
+        this image (its share of a batched prompt; 0 on a cache hit).
+        """
         # Get rule-based analysis
-        rule_result = self._enhanced_fallback_analysis(features)
+        if rule_result is None:
+            rule_result = self._rule_analysis(features)
+        if routing is None:
+            routing = (self.llm_provider is not None, None)
+        if routing[0] and not llm_result:
+            METRICS.inc("llm_fallbacks")
         
         # Combine results intelligently
-        combined_result = self._combine_analyses(llm_result, rule_result, features)
+        combined_result = self._combine_analyses(llm_result, rule_result, features, routing[0])
         
         # Add processing metadata
         combined_result["analysis_method"] = "hybrid" if llm_result else "rule-based"
         if llm_result:
             combined_result["llm_score"] = llm_result.get('image_quality_score', 'N/A')
         combined_result["rule_score"] = rule_result.get('image_quality_score', 'N/A')
+        combined_result["llm_routing"] = routing_info(*routing)
+        if routing[0] and prompt_tokens is not None:
+            combined_result["prompt_tokens_estimate"] = prompt_tokens
+        combined_result["provisional"] = False
         
         return combined_result
     
-    def _get_llm_analysis(self, features):
-        """Get analysis from LLM."""
+    def _get_llm_analysis(self, features, use_cache=True):
+        """Get analysis from LLM (served from the response cache when possible).
+        
+        Returns (result or None, estimated tokens of the prompt sent; 0 if none was).
+        """
+        prompt_tokens = 0
         try:
-            prompt = self._build_prompt(features)
+            prompt = self._prompt_for(features)
+            cached = self._cached_response(prompt) if use_cache else None
+            if cached is not None:
+                return cached, 0
             
-            if self.provider == "openai":
-                result = self._call_openai(prompt)
-                print(f"  ✓ OpenAI analysis complete")
-            else:  # gemini
-                result = self._call_gemini(prompt)
-                print(f"  ✓ Gemini analysis complete")
+            prompt_tokens = estimate_tokens(prompt)
+            METRICS.inc("prompt_tokens", prompt_tokens)
+            with span("llm_call"):
+                text = self.llm_provider.generate(prompt, timeout=Config.LLM_TIMEOUT_SECONDS)
+            result = self._parse_llm_response(text)
+            print(f"  ✓ {self.provider.capitalize()} analysis complete")
             
-            return result
+            if self.response_cache:
+                self.response_cache.put(self.provider, self.model, prompt, result)
+            
+            return result, prompt_tokens
             
         except Exception as e:
+            METRICS.inc("llm_failures")
             print(f"  ⚠  {self.provider.capitalize()} API failed: {e}")
+            return None, prompt_tokens
+    
+    async def _get_llm_analysis_async(self, features, use_cache=True):
+        """asyncio counterpart of _get_llm_analysis (same cache, same parsing, same return)."""
+        prompt_tokens = 0
+        try:
+            prompt = self._prompt_for(features)
+            cached = self._cached_response(prompt) if use_cache else None
+            if cached is not None:
+                return cached, 0
+            
+            if self._async_client is None:
+                from async_llm import AsyncLLMClient
+                self._async_client = AsyncLLMClient(self.llm_provider)
+            prompt_tokens = estimate_tokens(prompt)
+            METRICS.inc("prompt_tokens", prompt_tokens)
+            with span("llm_call"):
+                text = await self._async_client.generate(prompt)
+            result = self._parse_llm_response(text)
+            print(f"  ✓ {self.provider.capitalize()} analysis complete")
+            
+            if self.response_cache:
+                self.response_cache.put(self.provider, self.model, prompt, result)
+            
+            return result, prompt_tokens
+            
+        except Exception as e:
+            METRICS.inc("llm_failures")
+            print(f"  ⚠  {self.provider.capitalize()} API failed: {type(e).__name__}: {e}")
+            return None, prompt_tokens
+    
+    def _get_llm_batch_analysis(self, features_list):
+        """LLM results for several images from one request; None where even the retry failed.
+        
+        Returns (results, prompt tokens sent per image): each pending image is
+        charged an equal share of the batched prompt, plus its own prompt if
+        it had to be retried alone.
+        """
+        results, pending, prompt = self._prepare_batch(features_list)
+        prompt_tokens = self._batch_shares(len(features_list), pending, prompt)
+        if prompt is not None:
+            try:
+                with span("llm_call"):
+                    text = self.llm_provider.generate(prompt, timeout=Config.LLM_TIMEOUT_SECONDS)
+            except Exception as e:
+                METRICS.inc("llm_failures")
+                print(f"  ⚠  Batched {self.provider} request failed ({e}), falling back to single-image calls")
+                text = None
+            self._apply_batch_reply(text, pending, features_list, results)
+            fallbacks = [index for index in pending if results[index] is None]
+            METRICS.inc("llm_batch_item_fallbacks", len(fallbacks))
+        else:
+            fallbacks = pending  # At most one image, sent with the single-image prompt
+        # These already missed the response cache in _prepare_batch
+        for index in fallbacks:
+            results[index], sent = self._get_llm_analysis(features_list[index], use_cache=False)
+            prompt_tokens[index] += sent
+        return results, prompt_tokens
+    
+    async def _get_llm_batch_analysis_async(self, features_list):
+        """asyncio counterpart of _get_llm_batch_analysis."""
+        results, pending, prompt = self._prepare_batch(features_list)
+        prompt_tokens = self._batch_shares(len(features_list), pending, prompt)
+        if prompt is not None:
+            if self._async_client is None:
+                from async_llm import AsyncLLMClient
+                self._async_client = AsyncLLMClient(self.llm_provider)
+            try:
+                with span("llm_call"):
+                    text = await self._async_client.generate(
+                        prompt, expected_output_tokens=Config.LLM_EXPECTED_OUTPUT_TOKENS * len(pending)
+                    )
+            except Exception as e:
+                METRICS.inc("llm_failures")
+                print(f"  ⚠  Batched {self.provider} request failed ({type(e).__name__}: {e}), "
+                      "falling back to single-image calls")
+                text = None
+            self._apply_batch_reply(text, pending, features_list, results)
+            fallbacks = [index for index in pending if results[index] is None]
+            METRICS.inc("llm_batch_item_fallbacks", len(fallbacks))
+        else:
+            fallbacks = pending  # At most one image, sent with the single-image prompt
+        # These already missed the response cache in _prepare_batch
+        retried = await asyncio.gather(
+            *(self._get_llm_analysis_async(features_list[i], use_cache=False) for i in fallbacks)
+        )
+        for index, (result, sent) in zip(fallbacks, retried):
+            results[index] = result
+            prompt_tokens[index] += sent
+        return results, prompt_tokens
+    
+    @staticmethod
+    def _batch_shares(count, pending, prompt):
+        """Per-image share of the batched prompt's estimated tokens (0 for images not in it)."""
+        prompt_tokens = [0] * count
+        if prompt is not None:
+            share = round(estimate_tokens(prompt) / len(pending))
+            for index in pending:
+                prompt_tokens[index] = share
+        return prompt_tokens
+    
+    def _prepare_batch(self, features_list):
+        """Serve what the response cache can; return (results, pending indexes, batch prompt or None).
+        
+        With a single pending image there is nothing to share: no batch prompt
+        is built and the caller sends it through the single-image path.
+        """
+        results = [None] * len(features_list)
+        pending = []
+        for index, features in enumerate(features_list):
+            cached = self._cached_response(self._prompt_for(features)) if self.response_cache else None
+            if cached is not None:
+                results[index] = cached
+            else:
+                pending.append(index)
+        if len(pending) <= 1:
+            return results, pending, None
+        with span("prompt_build"):
+            prompt = self._build_batch_prompt([(f"img{index}", features_list[index]) for index in pending])
+        METRICS.inc("llm_batch_requests")
+        METRICS.inc("llm_batch_items", len(pending))
+        METRICS.inc("prompt_tokens", estimate_tokens(prompt))
+        return results, pending, prompt
+    
+    def _apply_batch_reply(self, text, pending, features_list, results):
+        """Fill results from a batched reply; invalid or missing elements stay None."""
+        if text is None:
+            return
+        try:
+            elements = self._parse_batch_response(text)
+        except ValueError as e:
+            print(f"  ⚠  Could not parse batched reply ({e}), falling back to single-image calls")
+            return
+        by_id = {}
+        for element in elements:
+            if isinstance(element, dict) and "id" in element:
+                by_id.setdefault(str(element["id"]), element)
+        for index in pending:
+            result = self._validate_batch_item(by_id.get(f"img{index}"))
+            if result is None:
+                continue
+            results[index] = result
+            if self.response_cache:
+                self.response_cache.put(self.provider, self.model, self._build_prompt(features_list[index]), result)
+    
+    def _parse_batch_response(self, text):
+        """The list of per-image elements in a batched reply ({"results": [...]} or a bare array)."""
+        if not self.llm_provider.strict_json:
+            text = text.strip().replace('```json', '').replace('```', '').strip()
+        try:
+            parsed = json.loads(text)
+        except json.JSONDecodeError:
+            if self.llm_provider.strict_json:
+                raise ValueError("reply is not valid JSON")
+            match = re.search(r'\{.*\}|\[.*\]', text, re.DOTALL)
+            if not match:
+                raise ValueError("no JSON found in reply")
+            try:
+                parsed = json.loads(match.group())
+            except json.JSONDecodeError:
+                raise ValueError("reply is not valid JSON")
+        if isinstance(parsed, dict):
+            parsed = parsed.get("results")
+        if not isinstance(parsed, list):
+            raise ValueError("reply has no results array")
+        return parsed
+    
+    def _validate_batch_item(self, element):
+        """One image's analysis from a batched reply, or None if it is unusable."""
+        if not isinstance(element, dict):
+            return None
+        score = element.get("image_quality_score")
+        if isinstance(score, bool) or not isinstance(score, (int, float)) or not 0 <= score <= 1:
             return None
+        if not isinstance(element.get("final_verdict"), str) or not element["final_verdict"]:
+            return None
+        if not isinstance(element.get("issues_detected", []), list):
+            return None
+        return {k: v for k, v in element.items() if k != "id"}
+    
+    def _prompt_for(self, features):
+        with span("prompt_build"):
+            return self._build_prompt(features)
     
-    def _combine_analyses(self, llm_result, rule_result, features):
+    def _cached_response(self, prompt):
+        """Parsed LLM result for this prompt from the response cache, or None."""
+        if not self.response_cache:
+            return None
+        cached = self.response_cache.get(self.provider, self.model, prompt)
+        if cached is None:
+            METRICS.inc("llm_cache_misses")
+            return None
+        METRICS.inc("llm_cache_hits")
+        print(f"  ✓ LLM response cache hit")
+        return cached
+    
+    def _combine_analyses(self, llm_result, rule_result, features, llm_called=True):
         """Intelligently combine LLM and rule-based results."""
         
         if not llm_result:
             # No LLM result, use rule-based
-            print("  Using rule-based analysis (LLM failed)")
+            print("  Using rule-based analysis" + (" (LLM failed)" if llm_called else ""))
             return rule_result
         
         # Check for obvious LLM errors
-        llm_issues = self._validate_llm_result(llm_result, features)
+        with span("validation"):
+            llm_issues = self._validate_llm_result(llm_result, features)
         
         if llm_issues:
             print(f"  LLM validation issues detected: {', '.join(llm_issues)}")
             # LLM made questionable call, blend with rule-based
-            return self._blend_results(llm_result, rule_result, weight=0.3)  # 30% LLM, 70% rules
+            with span("blend"):
+                return self._blend_results(llm_result, rule_result, weight=0.3)  # 30% LLM, 70% rules
         else:
             # LLM result seems reasonable
             print("  Using LLM analysis (validated)")
@@ -150,8 +552,7 @@ class LLMReasoner:
         
         # Check 2: If contains person/bed but LLM says suitable
         objects = [obj['object'].lower() for obj in features['detected_objects']]
-        personal_items = ['person', 'bed', 'couch', 'sofa', 'food', 'toilet', 'bathroom', 'kitchen']
-        has_personal = any(any(item in obj for item in personal_items) for obj in objects)
+        has_personal = any(PERSONAL_ITEM_MATCHER.matches_class(obj) for obj in objects)
         
         if has_personal and llm_result.get('final_verdict', '').lower().startswith('suitable'):
             issues.append("LLM approved image with personal items")
@@ -164,8 +565,7 @@ class LLMReasoner:
         # Check 4: If LLM missed obvious text issues
         if features['has_text'] and len(features['detected_text']) > 20:
             text_lower = features['detected_text'].lower()
-            casual_indicators = ['personal', 'name', 'www.', 'http://', '@', 'casual', 'funny', 'meme']
-            if any(indicator in text_lower for indicator in casual_indicators):
+            if LLM_CASUAL_TEXT_MATCHER.search(text_lower):
                 if 'contains text' not in ' '.join(llm_result.get('issues_detected', [])).lower():
                     issues.append("LLM missed casual text issue")
         
@@ -226,56 +626,54 @@ class LLMReasoner:
     
     def _build_prompt(self, features):
         """Build analysis prompt."""
+        return self._build_prompt_from_block(self._features_block(features))
+    
+    def _build_prompt_from_block(self, features_block):
         return f"""Analyze this image for e-commerce product suitability.
 
 EXTRACTED FEATURES:
-- Objects detected: {features['detected_objects']}
-- Main objects: {features['top_objects']}
-- Text found: "{features['detected_text']}"
-- Image sharpness: {features['blur_assessment']} (score: {features['blur_score']}/1.0)
-- Total objects: {features['object_count']}
+{features_block}
 
-CRITERIA FOR E-COMMERCE PRODUCT IMAGES:
-1. Professional: Clean background, good lighting, no personal items
-2. Product-focused: Product should be main subject
-3. High quality: Sharp, well-lit, no clutter
-4. Brand-appropriate: Minimal/no casual text
-
-IMPORTANT: Be strict about personal items (person, bed, furniture, food) - these make images unsuitable for professional e-commerce.
-
-ANALYSIS TASK:
-1. Score image quality 0-1 (be realistic, not overly generous)
-2. List any issues found (be specific)
-3. Provide final verdict
-4. Explain reasoning briefly
+{PROMPT_CRITERIA}
 
 OUTPUT FORMAT (JSON only):
-{{
-    "image_quality_score": 0.85,
-    "issues_detected": ["issue1", "issue2"],
-    "detected_objects": ["object1", "object2"],
-    "text_detected": [],
-    "llm_reasoning_summary": "Brief explanation...",
-    "final_verdict": "Suitable for professional e-commerce use",
-    "confidence": 0.8
-}}
+{PROMPT_OUTPUT_EXAMPLE}
 
 Return ONLY valid JSON, no other text."""
     
-    def _call_openai(self, prompt):
-        """Call OpenAI API."""
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.1,
-            response_format={"type": "json_object"}
+    def _features_block(self, features):
+        """Compact per-image features, sized so a single-image prompt fits Config.PROMPT_TOKEN_BUDGET."""
+        if self._features_budget is None:
+            template_tokens = estimate_tokens(self._build_prompt_from_block(""))
+            self._features_budget = max(64, Config.PROMPT_TOKEN_BUDGET - template_tokens)
+        return encode_features(features, self._features_budget, Config.PROMPT_MAX_OCR_CHARS)
+    
+    def _build_batch_prompt(self, items):
+        """One prompt for [(item_id, features), ...]; the criteria are stated once for all images."""
+        blocks = "\n\n".join(
+            f'IMAGE "{item_id}" EXTRACTED FEATURES:\n{self._features_block(features)}' for item_id, features in items
         )
-        return json.loads(response.choices[0].message.content)
+        example = PROMPT_OUTPUT_EXAMPLE.replace("{\n", '{\n    "id": "<image id>",\n', 1)
+        return f"""Analyze each of the following {len(items)} images for e-commerce product suitability.
+Judge every image independently.
+
+{blocks}
+
+{PROMPT_CRITERIA}
+
+OUTPUT FORMAT (JSON only): an object with a "results" array holding one analysis per image id:
+{{"results": [
+{example}
+]}}
+
+Return exactly {len(items)} results, one per image id. Return ONLY valid JSON, no other text."""
     
-    def _call_gemini(self, prompt):
-        """Call Google Gemini API."""
-        response = self.client.generate_content(prompt)
-        text = response.text.strip()
+    def _parse_llm_response(self, text):
+        """Parse a provider reply into the analysis dict."""
+        if self.llm_provider.strict_json:
+            return json.loads(text)
+        
+        text = text.strip()
         
         # Clean the response
         text = text.replace('```json', '').replace('```', '').strip()
@@ -338,136 +736,6 @@ Return ONLY valid JSON, no other text."""
         }
     
     def _enhanced_fallback_analysis(self, features):
-        """Enhanced rule-based analysis with better scoring."""
+        """Enhanced rule-based analysis with better scoring (see rule_engine.RuleEngine)."""
         print("  Using enhanced rule-based analysis...")
-        
-        # Initialize scoring
-        scores = {
-            "sharpness": features['blur_score'],
-            "object_focus": 0.0,
-            "background": 0.5,
-            "professionalism": 0.5
-        }
-        
-        issues = []
-        warnings = []
-        
-        # Analyze objects
-        objects = [obj['object'].lower() for obj in features['detected_objects']]
-        
-        # Product vs non-product objects
-        product_keywords = ['shoe', 'bag', 'watch', 'phone', 'laptop', 'product', 
-                           'electronics', 'clothing', 'accessory', 'jewelry', 'perfume',
-                           'cosmetic', 'makeup', 'tool', 'equipment', 'instrument']
-        non_product_keywords = ['person', 'face', 'hand', 'bed', 'couch', 'sofa',
-                               'food', 'animal', 'pet', 'toilet', 'bathroom', 'kitchen',
-                               'child', 'baby', 'dog', 'cat']
-        
-        product_count = sum(1 for obj in objects if any(kw in obj for kw in product_keywords))
-        non_product_count = sum(1 for obj in objects if any(kw in obj for kw in non_product_keywords))
-        
-        # Object focus score
-        if product_count > 0:
-            scores['object_focus'] = 0.8
-            if product_count == 1:
-                scores['object_focus'] = 0.9
-        elif non_product_count == 0:
-            scores['object_focus'] = 0.6  # Neutral objects
-        else:
-            scores['object_focus'] = 0.3
-            issues.append(f"contains {non_product_count} non-product object(s)")
-        
-        # Background/clutter analysis
-        total_objects = len(objects)
-        if total_objects <= 2:
-            scores['background'] = 0.8  # Clean background
-        elif total_objects <= 4:
-            scores['background'] = 0.6  # Some clutter
-            warnings.append("multiple objects (potential clutter)")
-        else:
-            scores['background'] = 0.3  # Cluttered
-            issues.append("too many objects (cluttered background)")
-        
-        # Text analysis
-        if features['has_text']:
-            text = features['detected_text'].lower()
-            if len(text) > 10:  # Meaningful text
-                # Check if it looks like product text
-                product_text_indicators = ['$', 'price', 'sale', 'brand', 'model', 'size', 'product', 'item']
-                casual_text_indicators = ['personal', 'name', 'www.', 'http', '@', 'funny', 'meme', 'lol']
-                
-                has_product_text = any(indicator in text for indicator in product_text_indicators)
-                has_casual_text = any(indicator in text for indicator in casual_text_indicators)
-                
-                if has_product_text and not has_casual_text:
-                    scores['professionalism'] = 0.7  # Product text is OK
-                    warnings.append("contains product/brand text")
-                elif has_casual_text:
-                    scores['professionalism'] = 0.3  # Casual text is bad
-                    issues.append("contains casual/personal text")
-                else:
-                    scores['professionalism'] = 0.5  # Neutral text
-                    warnings.append("contains text")
-            else:
-                scores['professionalism'] = 0.6  # Minimal text
-        else:
-            scores['professionalism'] = 0.8  # No text is good
-        
-        # Calculate weighted final score
-        weights = {
-            "sharpness": 0.3,      # 30% - image quality
-            "object_focus": 0.4,   # 40% - subject matter
-            "background": 0.2,     # 20% - composition
-            "professionalism": 0.1 # 10% - text/branding
-        }
-        
-        final_score = sum(scores[category] * weights[category] for category in scores)
-        final_score = max(0.1, min(0.95, final_score))
-        
-        # Determine verdict
-        if final_score >= 0.7 and len(issues) == 0:
-            verdict = "Suitable for professional e-commerce use"
-            confidence = final_score
-        elif final_score >= 0.5 and len(issues) <= 1:
-            verdict = "Marginally suitable for professional e-commerce use"
-            confidence = final_score * 0.9
-        else:
-            verdict = "Not suitable for professional e-commerce use"
-            confidence = max(0.5, final_score)
-        
-        # Build reasoning summary
-        reasoning_parts = []
-        
-        if scores['sharpness'] >= 0.7:
-            reasoning_parts.append("Image is sharp and clear")
-        elif scores['sharpness'] >= 0.4:
-            reasoning_parts.append("Image has acceptable sharpness")
-        else:
-            reasoning_parts.append("Image is blurry")
-        
-        if product_count > 0:
-            reasoning_parts.append(f"Contains {product_count} product-like object(s)")
-        elif non_product_count > 0:
-            reasoning_parts.append(f"Contains {non_product_count} non-product object(s)")
-        
-        if features['has_text']:
-            reasoning_parts.append("Contains text")
-        
-        if len(issues) > 0:
-            reasoning_parts.append(f"Has {len(issues)} quality issue(s)")
-        elif len(warnings) > 0:
-            reasoning_parts.append(f"Has {len(warnings)} warning(s)")
-        
-        reasoning_summary = "Rule-based analysis: " + ". ".join(reasoning_parts) + "."
-        
-        return {
-            "image_quality_score": round(final_score, 2),
-            "issues_detected": issues,
-            "warnings": warnings,
-            "detected_objects": features['top_objects'][:5],
-            "text_detected": [features['detected_text']] if features['detected_text'] else [],
-            "llm_reasoning_summary": reasoning_summary,
-            "final_verdict": verdict,
-            "confidence": round(confidence, 2),
-            "score_breakdown": {k: round(v, 2) for k, v in scores.items()}
-        }
\ No newline at end of file
+        return self.rule_engine.analyze(features)
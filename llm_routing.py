@@ -0,0 +1,85 @@
+# llm_routing.py
+import threading
+from config import Config
+from metrics import METRICS
+
+# Routing reasons recorded in each result's "llm_routing" block
+ROUTING_DISABLED = "routing_disabled"
+NO_LLM_PROVIDER = "no_llm_provider"
+CLEAR_REJECT_ISSUES = "clear_reject_issues"
+CLEAR_REJECT_SCORE = "clear_reject_score"
+CLEAR_ACCEPT = "clear_accept"
+SCORE_IN_BAND = "score_in_band"
+HAS_ISSUES = "has_issues"
+LOW_CONFIDENCE = "low_confidence"
+
+
+class LLMRoutingPolicy:
+    """Decides from the rule-based result whether an image needs the LLM at all.
+
+    Images the rules already settle are not sent: enough issues or a score
+    below the ambiguity band is a certain rejection, and a score above the
+    band with no issues and high confidence is a certain accept. Everything
+    else (the band itself, or a high score with an issue or low confidence)
+    goes to the LLM. Disabled, every image goes to the LLM as before.
+    """
+
+    def __init__(self, enabled=None, score_band=None, min_confidence=None, reject_issues=None):
+        self.enabled = Config.LLM_ROUTING_ENABLED if enabled is None else enabled
+        self.low, self.high = score_band or Config.LLM_ROUTING_SCORE_BAND
+        self.min_confidence = Config.LLM_ROUTING_MIN_CONFIDENCE if min_confidence is None else min_confidence
+        self.reject_issues = Config.LLM_ROUTING_REJECT_ISSUES if reject_issues is None else reject_issues
+        self.decisions = 0
+        self.skipped = 0
+        self.reasons = {}
+        self._lock = threading.Lock()
+
+    def decide(self, rule_result):
+        """(call_llm, reason) for one rule-based analysis dict."""
+        call_llm, reason = self._classify(rule_result)
+        self._record(call_llm, reason)
+        return call_llm, reason
+
+    def _classify(self, rule_result):
+        if not self.enabled:
+            return True, ROUTING_DISABLED
+        score = rule_result['image_quality_score']
+        issues = len(rule_result['issues_detected'])
+        if issues >= self.reject_issues:
+            return False, CLEAR_REJECT_ISSUES
+        if score < self.low:
+            return False, CLEAR_REJECT_SCORE
+        if score <= self.high:
+            return True, SCORE_IN_BAND
+        if issues:
+            return True, HAS_ISSUES
+        if rule_result['confidence'] < self.min_confidence:
+            return True, LOW_CONFIDENCE
+        return False, CLEAR_ACCEPT
+
+    def _record(self, call_llm, reason):
+        with self._lock:
+            self.decisions += 1
+            self.skipped += 0 if call_llm else 1
+            self.reasons[reason] = self.reasons.get(reason, 0) + 1
+        METRICS.inc("llm_routed" if call_llm else "llm_skipped")
+        METRICS.inc(f"llm_route_{reason}")
+
+    @property
+    def skip_rate(self):
+        with self._lock:
+            return self.skipped / self.decisions if self.decisions else 0.0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "decisions": self.decisions,
+                "skipped": self.skipped,
+                "skip_rate": round(self.skipped / self.decisions, 3) if self.decisions else 0.0,
+                "reasons": dict(self.reasons),
+            }
+
+
+def routing_info(call_llm, reason):
+    return {"llm_called": call_llm, "reason": reason}
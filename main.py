@@ -1,16 +1,34 @@
+import os
 import sys
+import glob
 import json
 import time
-from feature_extractor import FeatureExtractor
-from llm_reasoner import LLMReasoner
+import argparse
+import contextlib
+from datetime import datetime
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff"}
 
 class MultimodalAnalyzer:
-    def __init__(self):
+    def __init__(self, rules_only=False, llm_provider=None):
+        # Stage modules are imported here, not at module load, so importing
+        # MultimodalAnalyzer (or running --help) stays cheap. YOLO/torch and
+        # the LLM SDKs are further deferred until their stage first runs.
+        from config import Config
+        from feature_extractor import FeatureExtractor
+        from llm_reasoner import LLMReasoner
+        from near_duplicates import NearDuplicateIndex
+        
         print("Initializing Multimodal Analyzer...")
         print("=" * 50)
         self.feature_extractor = FeatureExtractor()
+        # Analyses of processed images, reused for re-encoded/resized copies
+        self.duplicate_index = NearDuplicateIndex() if Config.NEAR_DUPLICATE_DETECTION else None
         try:
-            self.llm_reasoner = LLMReasoner()
+            # Rules-only mode never touches (or imports) an LLM SDK
+            # An injected provider (e.g. FakeProvider for benchmarks) replaces Config.LLM_PROVIDER
+            self.llm_reasoner = LLMReasoner(provider_name="fallback" if rules_only else None,
+                                            llm_provider=None if rules_only else llm_provider)
             print("✓ LLM Reasoner initialized (OpenAI)")
         except Exception as e:
             print(f"⚠  LLM initialization warning: {e}")
@@ -19,24 +37,317 @@ class MultimodalAnalyzer:
     
     def analyze(self, image_path):
         """Main pipeline: extract features, reason with LLM, return structured output."""
+        for result in self.analyze_stream(image_path, provisional=False):
+            pass
+        return result
+    
+    def analyze_stream(self, image_path, provisional=True):
+        """Like analyze, but first yields the rule-based output (provisional=True)
+        as soon as features are extracted, then the final output once the LLM
+        answer has been validated and blended. Early rejects and rules-only
+        runs yield just the final output.
+        """
+        from image_io import as_decoded_image
+        from metrics import Trace
+        
         print(f"\nAnalyzing image: {image_path}")
+        image = as_decoded_image(image_path)
+        start_time = time.time()
+        # Each stage runs under its own trace, seeded with the spans so far; a
+        # trace held open across a yield breaks if the generator is closed elsewhere
+        timings = Trace()
+        
+        # 0. Cheap quality gates (blur, resolution, brightness) when enabled
+        rejected, timings = self._traced(timings, self.early_exit, image)
+        if rejected is not None:
+            yield rejected
+            return
+        
+        # Near-copies of an already-analyzed image reuse its analysis
+        duplicate, timings = self._traced(timings, self.near_duplicate, image, start_time)
+        if duplicate is not None:
+            yield duplicate
+            return
         
         # 1. Extract meaningful visual features (Pre-LLM Intelligence)
         print("\n[1/2] Extracting image features...")
-        start_time = time.time()
-        features = self.feature_extractor.run_all(image_path)
+        features, timings = self._traced(timings, self.feature_extractor.run_all, image)
         feature_time = time.time() - start_time
         
+        self._report_features(features, feature_time)
+        stream = self._reason_stream(image_path, features, feature_time, self._stages(image),
+                                     provisional=provisional)
+        while True:
+            result, timings = self._traced(timings, next, stream, None)
+            if result is None:
+                return
+            if not result.get("provisional"):
+                self._remember(image, result)
+            yield result
+    
+    @staticmethod
+    def _traced(timings, func, *args):
+        """func(*args) under a new trace that starts from `timings`; returns (result, that trace)."""
+        from metrics import trace
+        
+        with trace() as stage_trace:
+            stage_trace.merge(timings)
+            result = func(*args)
+        return result, stage_trace
+    
+    def early_exit(self, image):
+        """Run the cheap quality gates; return a final rejection output or None.
+        
+        Images failing a hard threshold are rejected by rules alone, without
+        detection, OCR or an LLM call. Gate measurements are memoized on the
+        image, so images that pass reuse the blur score. No-op unless
+        Config.EARLY_EXIT_ENABLED.
+        """
+        from config import Config
+        from metrics import METRICS, span
+        from quality_gates import evaluate_quality_gates, gate_features, gate_rejection_analysis
+        
+        if not Config.EARLY_EXIT_ENABLED:
+            return None
+        start_time = time.time()
+        # A file that does not decode is an error for the caller, not a rejection
+        self.feature_extractor.prepare(image)
+        with span("quality_gates"):
+            gates = self.feature_extractor.extract_quality_gates(image)
+        image.derived["quality_gates"] = gates
+        failures = evaluate_quality_gates(gates)
+        if not failures:
+            return None
+        
+        METRICS.inc("early_exits")
+        features = gate_features(gates)
+        analysis = gate_rejection_analysis(features, failures)
+        return self._build_output(analysis, features, time.time() - start_time, ["quality_gates"])
+    
+    def near_duplicate(self, image, start_time, count_miss=True):
+        """Derived output reusing a stored near-duplicate's analysis, or None.
+        
+        On a miss the image's hashes are kept in image.derived so _remember
+        can index its result. No-op unless Config.NEAR_DUPLICATE_DETECTION.
+        count_miss=False leaves the miss uncounted for callers that look
+        further (analyze_many also checks its current chunk).
+        """
+        from metrics import METRICS, span
+        from near_duplicates import image_hashes
+        
+        if self.duplicate_index is None:
+            return None
+        with span("perceptual_hash"):
+            # Decode at the extractors' resolution so a miss does not decode twice
+            self.feature_extractor.prepare(image)
+            image.derived["perceptual_hash"] = image_hashes(image)
+        match = self.duplicate_index.lookup(image.derived["perceptual_hash"])
+        if match is None:
+            if count_miss:
+                METRICS.inc("near_duplicate_misses")
+            return None
+        
+        METRICS.inc("near_duplicate_hits")
+        (source, source_result), distance, dhash_distance = match
+        return self._derived_output(image, source, source_result, distance, dhash_distance,
+                                    time.time() - start_time)
+    
+    def _derived_output(self, image, source, source_result, distance, dhash_distance, total_time):
+        """Output for a near-duplicate: the source's analysis, marked as derived."""
+        print(f"   ✓ Near-duplicate of {source} (pHash distance {distance}, dHash {dhash_distance}); "
+              "reusing its analysis")
+        analysis = {k: v for k, v in source_result.items()
+                    if k not in ["processing_time", "stages_run", "timings", "raw_features"]}
+        analysis["derived"] = True
+        analysis["derived_from"] = {
+            "image": source,
+            "phash_distance": distance,
+            "dhash_distance": dhash_distance,
+        }
+        stages = (["quality_gates"] if "quality_gates" in image.derived else []) + ["near_duplicate_lookup"]
+        return self._build_output(analysis, source_result["raw_features"], total_time, stages)
+    
+    def _remember(self, image, result):
+        """Index a fully analyzed image's final result for later near-duplicates."""
+        hashes = image.derived.get("perceptual_hash")
+        if self.duplicate_index is not None and hashes is not None:
+            self.duplicate_index.add(hashes, (image.name, result))
+    
+    def _stages(self, image):
+        return (["quality_gates"] if "quality_gates" in image.derived else []) + ["feature_extraction"]
+    
+    def analyze_many(self, image_paths, batch_size=None, on_features=None):
+        """Analyze many images with one warm pipeline, batching YOLO calls.
+        
+        Yields (image_path, result, error) per image in input order as soon as
+        it is done; exactly one of result/error is None. Unreadable and
+        undecodable files are reported as errors instead of producing an
+        all-zero analysis.
+        on_features(image_path, features), if given, receives the full run_all
+        output of every image that went through extraction. DecodedImages are
+        accepted in place of paths (e.g. already read and hashed) and reported
+        under their name.
+        """
+        from config import Config
+        from image_io import as_decoded_image
+        from metrics import METRICS, trace
+        from near_duplicates import NearDuplicateIndex
+        
+        batch_size = batch_size or Config.YOLO_BATCH_SIZE
+        image_paths = list(image_paths)
+        for start in range(0, len(image_paths), batch_size):
+            chunk = []
+            for image_path in image_paths[start:start + batch_size]:
+                image = as_decoded_image(image_path)
+                image_path = image.name
+                try:
+                    image.data
+                    chunk.append((image_path, image, None))
+                except OSError as e:
+                    chunk.append((image_path, None, f"{type(e).__name__}: {e}"))
+            
+            # Early-rejected images and near-duplicates never reach the batched detector
+            rejected = {}
+            gate_traces = {}
+            copies = {}  # position -> (position of an earlier image in this chunk, distances)
+            chunk_index = NearDuplicateIndex() if self.duplicate_index is not None else None
+            for position, (image_path, image, error) in enumerate(chunk):
+                if error is None:
+                    try:
+                        with trace() as gate_trace:
+                            gate_start = time.time()
+                            output = self.early_exit(image)
+                            if output is None:
+                                output = self.near_duplicate(image, gate_start, count_miss=False)
+                    except Exception as e:
+                        # Both decode the image; a corrupt file is an error like a missing one
+                        chunk[position] = (image_path, None, f"{type(e).__name__}: {e}")
+                        continue
+                    gate_traces[position] = gate_trace
+                    if output is not None:
+                        rejected[position] = output
+                    elif chunk_index is not None:
+                        # Copies within the chunk wait for the first one's result
+                        match = chunk_index.lookup(image.derived["perceptual_hash"])
+                        if match is None:
+                            METRICS.inc("near_duplicate_misses")
+                            chunk_index.add(image.derived["perceptual_hash"], position)
+                        else:
+                            METRICS.inc("near_duplicate_hits")
+                            copies[position] = match
+            
+            positions = [position for position, (_, _, error) in enumerate(chunk)
+                         if error is None and position not in rejected and position not in copies]
+            readable = [chunk[position][1] for position in positions]
+            start_time = time.time()
+            with trace() as batch_trace:
+                all_features = self.feature_extractor.run_all_batch(readable) if readable else []
+            # YOLO ran once for the whole chunk; attribute the time evenly
+            feature_time = (time.time() - start_time) / max(1, len(readable))
+            
+            features_at = {}
+            for position, features in zip(positions, all_features):
+                if features is None:
+                    image_path = chunk[position][0]
+                    chunk[position] = (image_path, None, f"ValueError: Could not decode image: {image_path}")
+                else:
+                    features_at[position] = features
+            
+            # Several images per LLM request when Config.LLM_BATCH_SIZE > 1
+            analyses, reasoning_trace, reasoning_time = self._reason_batch(
+                [chunk[position][0] for position in features_at], list(features_at.values())
+            )
+            outcomes = {}
+            
+            for position, (image_path, image, error) in enumerate(chunk):
+                if error is not None:
+                    yield image_path, None, error
+                    continue
+                if position in rejected:
+                    yield image_path, rejected[position], None
+                    continue
+                if position in copies:
+                    source_position, distance, dhash_distance = copies[position]
+                    source_path, source_result, source_error = outcomes[source_position]
+                    if source_error is not None:
+                        yield image_path, None, f"near-duplicate of {source_path}, which failed: {source_error}"
+                        continue
+                    with trace() as image_trace:
+                        image_trace.merge(gate_traces[position])
+                        result = self._derived_output(image, source_path, source_result, distance, dhash_distance,
+                                                      sum(gate_traces[position].stages.values()))
+                    yield image_path, result, None
+                    continue
+                features = features_at[position]
+                if on_features is not None:
+                    on_features(image_path, features)
+                analysis = next(analyses) if analyses else None
+                try:
+                    with trace() as image_trace:
+                        image_trace.merge(gate_traces[position])
+                        image_trace.merge(batch_trace, share=1 / len(readable))
+                        if analysis is not None:
+                            image_trace.merge(reasoning_trace, share=1 / len(features_at))
+                        result = self._reason(image_path, features, feature_time, self._stages(image),
+                                              analysis=analysis, llm_time=reasoning_time)
+                    self._remember(image, result)
+                    outcomes[position] = (image_path, result, None)
+                    yield image_path, result, None
+                except Exception as e:
+                    outcomes[position] = (image_path, None, f"{type(e).__name__}: {e}")
+                    yield outcomes[position]
+    
+    def _reason_batch(self, names, all_features):
+        """Batched LLM reasoning for a chunk: (analyses iterator, trace, time per image), or (None, None, None)."""
+        from config import Config
+        from metrics import trace
+        
+        if (Config.LLM_BATCH_SIZE <= 1 or not names or not self.llm_reasoner
+                or not self.llm_reasoner.llm_provider):
+            return None, None, None
+        print(f"\n[2/2] Reasoning over {len(names)} images, up to {Config.LLM_BATCH_SIZE} per LLM request...")
+        start_time = time.time()
+        try:
+            with trace() as reasoning_trace:
+                analyses = self.llm_reasoner.analyze_features_batch(list(zip(names, all_features)))
+        except Exception as e:
+            print(f"⚠  Batched reasoning failed ({e}), reasoning per image")
+            return None, None, None
+        return iter(analyses), reasoning_trace, (time.time() - start_time) / len(names)
+    
+    def _report_features(self, features, feature_time):
         print(f"   ✓ Object detection: {features['object_count']} objects found")
         print(f"   ✓ Text detection: {'Text found' if features['has_text'] else 'No text'}")
         print(f"   ✓ Image sharpness: {features['blur_assessment']} ({features['blur_score']:.2f}/1.0)")
         print(f"   ⏱️  Feature extraction time: {feature_time:.2f}s")
+    
+    def _reason(self, image_path, features, feature_time, stages=None, analysis=None, llm_time=None):
+        """Reasoning stage and final output assembly, shared by analyze and analyze_many.
         
+        analysis/llm_time are passed in when reasoning already ran in a batch.
+        """
+        for result in self._reason_stream(image_path, features, feature_time, stages, analysis, llm_time):
+            pass
+        return result
+    
+    def _reason_stream(self, image_path, features, feature_time, stages=None, analysis=None, llm_time=None,
+                       provisional=False):
+        """_reason as a generator; with provisional=True the rule-based output is yielded first."""
         # 2. Reason over features using LLM
         print("\n[2/2] Reasoning over features...")
         start_time = time.time()
+        stages = list(stages or ["feature_extraction"])
         
-        if self.llm_reasoner:
+        if analysis is not None:
+            print(f"   ✓ Batched LLM analysis complete")
+        elif self.llm_reasoner and provisional:
+            for analysis in self.llm_reasoner.analyze_features_stream(image_path, features):
+                if analysis["provisional"]:
+                    print(f"   ✓ Provisional rule-based verdict: {analysis['final_verdict']}")
+                    yield self._build_output(analysis, features, feature_time + time.time() - start_time,
+                                             stages + ["rule_reasoning"])
+            print(f"   ✓ LLM analysis complete")
+        elif self.llm_reasoner:
             analysis = self.llm_reasoner.analyze_features(image_path, features)
             print(f"   ✓ LLM analysis complete")
         else:
@@ -44,29 +355,48 @@ class MultimodalAnalyzer:
             analysis = {
                 "image_quality_score": features['blur_score'],
                 "issues_detected": [],
-                "detected_objects": features['main_objects'],
+                "detected_objects": features['top_objects'],
                 "text_detected": [features['detected_text']] if features['detected_text'] else [],
                 "llm_reasoning_summary": "Fallback mode: Analysis based on blur score and object count only.",
                 "final_verdict": "Suitable" if features['blur_score'] > 0.5 and features['object_count'] <= 3 else "Not suitable",
-                "confidence": 0.6
+                "confidence": 0.6,
+                "provisional": False
             }
             print(f"   ✓ Fallback analysis complete")
         
-        llm_time = time.time() - start_time
+        if llm_time is None:
+            llm_time = time.time() - start_time
         print(f"   ⏱️  Reasoning time: {llm_time:.2f}s")
         
+        stages.append("llm_reasoning" if analysis.get("analysis_method") == "hybrid" else "rule_reasoning")
+        
         # 3. Combine results
-        total_time = feature_time + llm_time
+        yield self._build_output(analysis, features, feature_time + llm_time, stages)
+    
+    def _build_output(self, analysis, features, total_time, stages):
+        from metrics import METRICS, current_trace
+        
+        # Provisional outputs are superseded by a final one; count only that
+        if not analysis.get("provisional"):
+            METRICS.observe("total", total_time)
+            METRICS.inc("images_analyzed")
+        active = current_trace()
+        timings = active.timings() if active else {}
+        timings["total"] = round(total_time * 1000, 2)
+        
         final_output = {
             **analysis,
             "processing_time": round(total_time, 2),
+            "stages_run": stages,
+            "timings": timings,
             "raw_features": {
                 k: v for k, v in features.items() 
                 if k not in ['detected_objects', 'main_objects']
             }
         }
         
-        print(f"\n✅ Analysis complete in {total_time:.2f}s")
+        if not analysis.get("provisional"):
+            print(f"\n✅ Analysis complete in {total_time:.2f}s")
         return final_output
 
 def print_summary(result):
@@ -91,21 +421,203 @@ def print_summary(result):
     print(f"  {result['llm_reasoning_summary']}")
     print("\n" + "=" * 50)
 
-if __name__ == "__main__":
-    if len(sys.argv) != 2:
+def expand_inputs(sources):
+    """Expand files, directories, glob patterns and '-' (paths on stdin) into image paths.
+    
+    Order is deterministic (directories and globs are sorted) so --resume-from
+    offsets stay valid between runs; duplicates are dropped.
+    """
+    paths = []
+    for source in sources:
+        if source == "-":
+            paths.extend(line.strip() for line in sys.stdin if line.strip())
+        elif os.path.isdir(source):
+            for root, dirs, files in os.walk(source):
+                dirs.sort()
+                paths.extend(
+                    os.path.join(root, name) for name in sorted(files)
+                    if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+                )
+        elif glob.has_magic(source):
+            paths.extend(
+                path for path in sorted(glob.glob(source, recursive=True))
+                if os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS
+            )
+        else:
+            paths.append(source)
+    return list(dict.fromkeys(paths))
+
+def run_batch(analyzer, image_paths, output, resume_from=0, batch_size=None, progress=sys.stderr):
+    """Stream one JSON line per image to `output` as each finishes.
+    
+    `analyzer` is anything with an ordered analyze_many (a MultimodalAnalyzer
+    or a ProcessPoolBatchExecutor). Progress and throughput go to `progress`.
+    Returns (processed, failed).
+    """
+    total = len(image_paths)
+    pending = image_paths[resume_from:]
+    processed = failed = 0
+    start_time = time.time()
+    
+    for offset, (image_path, result, error) in enumerate(analyzer.analyze_many(pending, batch_size=batch_size)):
+        index = resume_from + offset
+        if error is None:
+            record = {"index": index, "path": image_path, **result}
+        else:
+            record = {"index": index, "path": image_path, "error": error}
+            failed += 1
+        output.write(json.dumps(record, default=str) + "\n")
+        output.flush()
+        
+        processed += 1
+        elapsed = time.time() - start_time
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        remaining = (len(pending) - processed) / rate if rate else 0.0
+        status = "ERROR" if error else result.get("final_verdict", "")
+        print(f"[{index + 1}/{total}] {rate:.2f} img/s, ETA {remaining:.0f}s - {image_path}: {status}",
+              file=progress, flush=True)
+    
+    elapsed = time.time() - start_time
+    print(f"Processed {processed} images ({failed} failed) in {elapsed:.1f}s "
+          f"({processed / elapsed if elapsed > 0 else 0.0:.2f} img/s)", file=progress, flush=True)
+    return processed, failed
+
+def write_metrics(path):
+    """Dump the process-wide METRICS as Prometheus text (*.prom) or a JSON summary."""
+    from metrics import METRICS
+    
+    with open(path, "w") as f:
+        if path.endswith(".prom"):
+            f.write(METRICS.to_prometheus())
+        else:
+            json.dump(METRICS.summary(), f, indent=2)
+
+def unique_output_path(prefix="analysis_output", extension=".json"):
+    """Timestamped path that never collides with an existing file."""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    candidate = f"{prefix}_{timestamp}{extension}"
+    counter = 1
+    while os.path.exists(candidate):
+        candidate = f"{prefix}_{timestamp}_{counter}{extension}"
+        counter += 1
+    return candidate
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Analyze product images for e-commerce suitability.",
+        epilog="Examples: python main.py samples/product_photo.jpg | "
+               "python main.py catalog/ 'uploads/**/*.jpg' -o results.jsonl | "
+               "find . -name '*.jpg' | python main.py -",
+    )
+    parser.add_argument("inputs", nargs="*",
+                        help="image files, directories, glob patterns, or '-' to read paths from stdin")
+    parser.add_argument("-o", "--output",
+                        help="batch mode: write JSON lines here ('-' = stdout, the default in batch mode)")
+    parser.add_argument("--resume-from", type=int, default=0, metavar="N",
+                        help="batch mode: skip the first N inputs (appends to --output)")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="batch mode: images per YOLO call (default: Config.YOLO_BATCH_SIZE)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="batch mode: worker processes (models are loaded once, before fork)")
+    parser.add_argument("--validate-llm", action="store_true",
+                        help="make a real request to the configured LLM and record the working model")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="write per-stage latency histograms and counters here at the end "
+                             "(Prometheus text for *.prom, JSON summary otherwise)")
+    parser.add_argument("--manifest", nargs="?", const="", metavar="PATH",
+                        help="batch mode: incremental run against a catalog manifest (default: Config.MANIFEST_PATH); "
+                             "unchanged images are skipped and rule/prompt changes only re-run reasoning")
+    parser.add_argument("--prune", action="store_true",
+                        help="with --manifest: after the run, drop manifest entries for files no longer found "
+                             "under the directories given as inputs (not with --resume-from)")
+    parser.add_argument("--rules-only", action="store_true",
+                        help="skip the LLM entirely and use rule-based analysis (LLM SDKs are never imported)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.manifest is not None and args.workers > 1:
+        print("--manifest runs in-process; drop --workers", file=sys.stderr)
+        return 2
+    if args.prune and (args.manifest is None or args.resume_from):
+        print("--prune needs --manifest and a complete run (no --resume-from)", file=sys.stderr)
+        return 2
+    
+    if args.validate_llm:
+        # Explicit health check; normal startup never probes the provider
+        from llm_reasoner import LLMReasoner
+        ok = LLMReasoner().validate()
+        if not args.inputs:
+            return 0 if ok else 1
+    
+    if not args.inputs:
         print("Usage: python main.py <path_to_image>")
         print("Example: python main.py samples/product_photo.jpg")
-        sys.exit(1)
+        return 1
     
-    analyzer = MultimodalAnalyzer()
-    result = analyzer.analyze(sys.argv[1])
+    # --workers and --manifest are batch-mode options; a single file with either runs as a batch of one
+    single_image = (len(args.inputs) == 1 and os.path.isfile(args.inputs[0])
+                    and args.output is None and args.resume_from == 0
+                    and args.workers == 1 and args.manifest is None)
     
-    print_summary(result)
+    if single_image:
+        analyzer = MultimodalAnalyzer(rules_only=args.rules_only)
+        try:
+            result = analyzer.analyze(args.inputs[0])
+        except Exception as e:
+            print(f"✗ Could not analyze {args.inputs[0]}: {type(e).__name__}: {e}", file=sys.stderr)
+            return 1
+        
+        print_summary(result)
+        
+        # Save detailed results to file
+        output_file = unique_output_path()
+        with open(output_file, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\n📁 Detailed results saved to: {output_file}")
+        if args.metrics:
+            write_metrics(args.metrics)
+            print(f"Metrics written to {args.metrics}")
+        return 0
     
-    # Save detailed results to file
-    timestamp = time.strftime("%Y%m%d_%H%M%S")
-    output_file = f"analysis_output_{timestamp}.json"
+    # Batch mode: one warm analyzer, one JSON line per image
+    image_paths = expand_inputs(args.inputs)
+    print(f"Found {len(image_paths)} images", file=sys.stderr)
     
-    with open(output_file, "w") as f:
-        json.dump(result, f, indent=2)
-    print(f"\n📁 Detailed results saved to: {output_file}")
\ No newline at end of file
+    to_stdout = args.output in (None, "-")
+    output = sys.stdout if to_stdout else open(args.output, "a" if args.resume_from else "w")
+    try:
+        # Keep stdout clean for JSON lines: pipeline logging goes to stderr
+        log_target = sys.stderr if to_stdout else sys.stdout
+        with contextlib.redirect_stdout(log_target):
+            if args.workers > 1:
+                from batch_executor import ProcessPoolBatchExecutor
+                runner = ProcessPoolBatchExecutor(workers=args.workers, rules_only=args.rules_only)
+            elif args.manifest is not None:
+                from manifest import CatalogManifest, IncrementalAnalyzer
+                runner = IncrementalAnalyzer(MultimodalAnalyzer(rules_only=args.rules_only),
+                                             CatalogManifest(args.manifest or None))
+            else:
+                runner = MultimodalAnalyzer(rules_only=args.rules_only)
+            try:
+                processed, failed = run_batch(runner, image_paths, output,
+                                              resume_from=args.resume_from, batch_size=args.batch_size)
+                if args.prune:
+                    runner.prune([source for source in args.inputs if os.path.isdir(source)])
+            finally:
+                if args.workers > 1:
+                    runner.close()
+    finally:
+        if not to_stdout:
+            output.close()
+    if args.manifest is not None:
+        counts = runner.counts
+        print(f"Manifest: {counts['unchanged']} unchanged, {counts['reasoned']} re-reasoned, "
+              f"{counts['analyzed']} analyzed, {counts['pruned']} pruned", file=sys.stderr)
+    if args.metrics:
+        write_metrics(args.metrics)
+        print(f"Metrics written to {args.metrics}", file=sys.stderr)
+    return 1 if failed and failed == processed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,286 @@
+# manifest.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from config import Config
+from feature_cache import extractor_fingerprint
+from image_io import DecodedImage
+from metrics import trace
+
+# Fixed input whose prompt is hashed, so any change to the prompt template shows up
+_PROMPT_PROBE_FEATURES = {
+    "detected_objects": [{"object": "handbag", "confidence": 0.9}, {"object": "person", "confidence": 0.6}],
+    "detected_text": "BRAND sale 20% off",
+    "object_count": 2,
+    "has_text": True,
+    "blur_score": 0.5,
+    "blur_assessment": "slightly blurry",
+    "top_objects": ["handbag", "person"],
+    "object_summary": "2 objects: handbag, person",
+}
+
+
+def _digest(settings):
+    return hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def pipeline_fingerprint(ocr_backend):
+    """Everything upstream of reasoning: the extractors (with the OCR backend
+    actually loaded) and the early-exit gates."""
+    return _digest({
+        "extractor": extractor_fingerprint(ocr_backend),
+        "gates": [
+            Config.EARLY_EXIT_ENABLED, Config.GATE_MIN_BLUR_SCORE, Config.GATE_MIN_WIDTH,
+            Config.GATE_MIN_HEIGHT, Config.GATE_MIN_BRIGHTNESS, Config.GATE_MAX_BRIGHTNESS,
+        ],
+    })
+
+
+def reasoning_fingerprint(llm_reasoner):
+    """Everything that turns stored features into a verdict.
+
+    Rule weights, keyword lists, the prompt (template, criteria and encoding
+    budget), the LLM and the routing policy are hashed directly; bump
+    Config.REASONING_VERSION for other changes to rule or blending code.
+    """
+    import rule_engine
+
+    settings = {"version": Config.REASONING_VERSION, "llm": None}
+    if llm_reasoner is not None:
+        policy = llm_reasoner.routing_policy
+        settings.update({
+            "weights": llm_reasoner.rule_engine.weights,
+            "keywords": [
+                rule_engine.PRODUCT_KEYWORDS, rule_engine.NON_PRODUCT_KEYWORDS, rule_engine.PERSONAL_ITEM_KEYWORDS,
+                rule_engine.PRODUCT_TEXT_INDICATORS, rule_engine.CASUAL_TEXT_INDICATORS,
+                rule_engine.LLM_CASUAL_TEXT_INDICATORS,
+            ],
+            "routing": [policy.enabled, policy.low, policy.high, policy.min_confidence, policy.reject_issues],
+        })
+        if llm_reasoner.llm_provider:
+            settings["llm"] = [llm_reasoner.provider, llm_reasoner.model]
+            settings["prompt"] = llm_reasoner._build_prompt(_PROMPT_PROBE_FEATURES)
+    return _digest(settings)
+
+
+class CatalogManifest:
+    """SQLite record of every analyzed image in a catalog.
+
+    One row per path: size, mtime, content hash, the pipeline and reasoning
+    fingerprints it was analyzed under, its full run_all features (when
+    extraction ran) and its result.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or Config.MANIFEST_PATH
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+
+    def _connection(self):
+        # SQLite connections must not cross fork(); reopen in child processes
+        if self._conn is None or self._conn_pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS images ("
+                "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime REAL NOT NULL, "
+                "content_hash TEXT NOT NULL, pipeline TEXT NOT NULL, reasoning TEXT NOT NULL, "
+                "features TEXT, result TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.commit()
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def get(self, path):
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT size, mtime, content_hash, pipeline, reasoning, features, result "
+                "FROM images WHERE path = ?", (path,)
+            ).fetchone()
+        if row is None:
+            return None
+        size, mtime, content_hash, pipeline, reasoning, features, result = row
+        return {
+            "size": size,
+            "mtime": mtime,
+            "content_hash": content_hash,
+            "pipeline": pipeline,
+            "reasoning": reasoning,
+            "features": json.loads(features) if features is not None else None,
+            "result": json.loads(result),
+        }
+
+    def put(self, path, stat, content_hash, pipeline, reasoning, features, result):
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO images "
+                "(path, size, mtime, content_hash, pipeline, reasoning, features, result, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime, content_hash, pipeline, reasoning,
+                 json.dumps(features) if features is not None else None,
+                 json.dumps(result, default=str), time.time()),
+            )
+            conn.commit()
+
+    def touch(self, path, stat):
+        """Record a new size/mtime for an entry whose content turned out unchanged."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("UPDATE images SET size = ?, mtime = ? WHERE path = ?",
+                         (stat.st_size, stat.st_mtime, path))
+            conn.commit()
+
+    def prune(self, keep_paths, roots):
+        """Delete entries under the directories in roots whose path is not in keep_paths.
+
+        Entries outside roots are never touched, so one manifest can serve
+        several catalogs. Returns how many entries were deleted.
+        """
+        keep_paths = set(keep_paths)
+        prefixes = tuple(os.path.join(os.path.abspath(root), "") for root in roots)
+        if not prefixes:
+            return 0
+        with self._lock:
+            conn = self._connection()
+            gone = [(path,) for path, in conn.execute("SELECT path FROM images")
+                    if path.startswith(prefixes) and path not in keep_paths]
+            conn.executemany("DELETE FROM images WHERE path = ?", gone)
+            conn.commit()
+        return len(gone)
+
+    def __len__(self):
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM images").fetchone()[0]
+
+
+class IncrementalAnalyzer:
+    """analyze_many over a CatalogManifest: only redo the stages that changed.
+
+    Per image, in order of cost:
+    - same size and mtime (or same content hash) and same fingerprints:
+      the stored result is returned ("unchanged")
+    - same content and pipeline, different reasoning fingerprint: reasoning
+      re-runs on the stored features, without decoding, YOLO or OCR
+      ("reasoned")
+    - anything else goes through MultimodalAnalyzer.analyze_many ("analyzed")
+
+    Results carry the outcome in "manifest_status". Failed images are not
+    recorded, so they are retried on the next run. Nothing is deleted
+    implicitly: after a complete run over whole directories, prune(roots)
+    drops the entries under them for files the run did not find.
+    """
+
+    def __init__(self, analyzer, manifest):
+        self.analyzer = analyzer
+        self.manifest = manifest
+        self.pipeline = pipeline_fingerprint(analyzer.feature_extractor.ocr_backend_name)
+        self.reasoning = reasoning_fingerprint(analyzer.llm_reasoner)
+        self.counts = {"unchanged": 0, "reasoned": 0, "analyzed": 0, "pruned": 0}
+        self.found = set()  # Manifest keys of every file seen so far
+
+    def analyze_many(self, image_paths, batch_size=None):
+        """Same contract as MultimodalAnalyzer.analyze_many (ordered (path, result, error))."""
+        batch_size = batch_size or Config.YOLO_BATCH_SIZE
+        image_paths = list(image_paths)
+        for start in range(0, len(image_paths), batch_size):
+            yield from self._analyze_chunk(image_paths[start:start + batch_size], batch_size)
+
+    def prune(self, roots):
+        """Drop manifest entries under the directories in roots that were not seen.
+
+        Only call this once analyze_many has gone through every file under
+        roots; a partial or resumed run would delete entries for the files
+        it skipped.
+        """
+        pruned = self.manifest.prune(self.found, roots)
+        self.counts["pruned"] += pruned
+        return pruned
+
+    def _analyze_chunk(self, image_paths, batch_size):
+        outcomes = {}
+        stored = []  # (path, key, stat, entry) that only need reasoning
+        stale = []  # (path, key, stat, DecodedImage, content hash) that need the full pipeline
+        for image_path in image_paths:
+            key = os.path.abspath(image_path)
+            try:
+                stat = os.stat(image_path)
+            except OSError as e:
+                outcomes[image_path] = (None, f"{type(e).__name__}: {e}")
+                continue
+            self.found.add(key)
+            entry = self.manifest.get(key)
+            # Hashed before analysis, and analyzed from the same bytes, so an
+            # edit mid-run cannot pair a new hash with an old result
+            image = DecodedImage.from_path(image_path)
+            try:
+                if entry is not None and (entry["size"], entry["mtime"]) != (stat.st_size, stat.st_mtime):
+                    # Touched or copied over: only the bytes decide whether it changed
+                    if image.content_hash == entry["content_hash"]:
+                        self.manifest.touch(key, stat)
+                    else:
+                        entry = None
+
+                if entry is not None and entry["pipeline"] == self.pipeline:
+                    if entry["reasoning"] == self.reasoning:
+                        outcomes[image_path] = (self._mark(entry["result"], "unchanged"), None)
+                        continue
+                    if entry["features"] is not None:
+                        stored.append((image_path, key, stat, entry))
+                        continue
+                stale.append((image_path, key, stat, image, image.content_hash))
+            except OSError as e:
+                outcomes[image_path] = (None, f"{type(e).__name__}: {e}")
+
+        if stored:
+            outcomes.update(self._reason(stored))
+
+        if stale:
+            features_by_path = {}
+            results = self.analyzer.analyze_many([image for _, _, _, image, _ in stale], batch_size=batch_size,
+                                                 on_features=features_by_path.__setitem__)
+            for (image_path, key, stat, image, content_hash), (_, result, error) in zip(stale, results):
+                if error is None:
+                    self.manifest.put(key, stat, content_hash, self.pipeline, self.reasoning,
+                                      features_by_path.get(image.name), result)
+                    result = self._mark(result, "analyzed")
+                outcomes[image_path] = (result, error)
+
+        for image_path in image_paths:
+            result, error = outcomes[image_path]
+            yield image_path, result, error
+
+    def _reason(self, stored):
+        """Re-run reasoning over stored features, batching LLM calls like analyze_many."""
+        print(f"\nRe-reasoning over stored features for {len(stored)} images")
+        all_features = [entry["features"] for _, _, _, entry in stored]
+        analyses, reasoning_trace, reasoning_time = self.analyzer._reason_batch(
+            [image_path for image_path, _, _, _ in stored], all_features
+        )
+        outcomes = {}
+        for (image_path, key, stat, entry), features in zip(stored, all_features):
+            analysis = next(analyses) if analyses else None
+            try:
+                with trace() as image_trace:
+                    if analysis is not None:
+                        image_trace.merge(reasoning_trace, share=1 / len(stored))
+                    result = self.analyzer._reason(image_path, features, 0.0, ["stored_features"],
+                                                   analysis=analysis, llm_time=reasoning_time)
+            except Exception as e:
+                outcomes[image_path] = (None, f"{type(e).__name__}: {e}")
+                continue
+            self.manifest.put(key, stat, entry["content_hash"], self.pipeline, self.reasoning, features, result)
+            outcomes[image_path] = (self._mark(result, "reasoned"), None)
+        return outcomes
+
+    def _mark(self, result, status):
+        self.counts[status] += 1
+        return {**result, "manifest_status": status}
@@ -0,0 +1,192 @@
+# metrics.py
+import contextlib
+import contextvars
+import threading
+import time
+from collections import deque
+
+# Latency histogram bucket upper bounds, in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class LatencyStats:
+    """Rolling latency samples for one stage, summarized as count/mean/p50/p95/p99 (ms)."""
+
+    def __init__(self, window=2048):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.samples.append(seconds * 1000)
+            self.count += 1
+
+    def summary(self):
+        with self._lock:
+            samples = sorted(self.samples)
+        if not samples:
+            return {"count": self.count}
+
+        def pct(p):
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))], 1)
+
+        return {
+            "count": self.count,
+            "mean_ms": round(sum(samples) / len(samples), 1),
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "p99_ms": pct(0.99),
+        }
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram (Prometheus semantics) plus recent percentiles."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = LatencyStats()
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.sum += seconds
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    self.bucket_counts[i] += 1
+        self.recent.record(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.bucket_counts), self.count, self.sum
+
+
+class MetricsRegistry:
+    """Process-wide stage latency histograms and event counters.
+
+    Stages are fed by span(); counters by inc(). Export with to_prometheus()
+    (text exposition format) or summary() (JSON-friendly dict).
+    """
+
+    def __init__(self, namespace="image_analysis"):
+        self.namespace = namespace
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(stage, Histogram())
+        histogram.observe(seconds)
+
+    def inc(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def counter(self, name):
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def summary(self):
+        with self._lock:
+            histograms = dict(self._histograms)
+            counters = dict(self._counters)
+        return {
+            "stages": {stage: histograms[stage].recent.summary() for stage in sorted(histograms)},
+            "counters": {name: counters[name] for name in sorted(counters)},
+        }
+
+    def to_prometheus(self):
+        with self._lock:
+            histograms = dict(self._histograms)
+            counters = dict(self._counters)
+
+        name = f"{self.namespace}_stage_duration_seconds"
+        lines = [f"# HELP {name} Time spent in each pipeline stage.", f"# TYPE {name} histogram"]
+        for stage in sorted(histograms):
+            histogram = histograms[stage]
+            bucket_counts, count, total = histogram.snapshot()
+            for bound, bucket_count in zip(histogram.buckets, bucket_counts):
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {bucket_count}')
+            lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {total}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {count}')
+
+        for counter in sorted(counters):
+            full_name = f"{self.namespace}_{counter}_total"
+            lines.append(f"# TYPE {full_name} counter")
+            lines.append(f"{full_name} {counters[counter]}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+
+class Trace:
+    """Per-image accumulation of stage durations (a stage may run more than once)."""
+
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def merge(self, other, share=1.0):
+        """Add another trace's stages, scaled (e.g. one image's share of a batched call)."""
+        for stage, seconds in list(other.stages.items()):
+            self.add(stage, seconds * share)
+
+    def timings(self):
+        """Stage durations in milliseconds, for the result dict's timings block."""
+        with self._lock:
+            return {stage: round(seconds * 1000, 2) for stage, seconds in self.stages.items()}
+
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextlib.contextmanager
+def trace():
+    """Collect the spans run inside this block (and in context-propagated threads)."""
+    active = Trace()
+    token = _current_trace.set(active)
+    try:
+        yield active
+    finally:
+        _current_trace.reset(token)
+
+
+@contextlib.contextmanager
+def span(stage):
+    """Time a pipeline stage into METRICS and the current trace, if any."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        METRICS.observe(stage, elapsed)
+        active = _current_trace.get()
+        if active is not None:
+            active.add(stage, elapsed)
+
+
+def submit_in_context(executor, func, *args):
+    """executor.submit that carries the caller's contextvars (and so its trace) to the worker."""
+    return executor.submit(contextvars.copy_context().run, func, *args)
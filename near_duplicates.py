@@ -0,0 +1,123 @@
+# near_duplicates.py
+import threading
+import cv2
+import numpy as np
+from config import Config
+
+
+def _pack_bits(bits):
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def phash(gray):
+    """64-bit DCT perceptual hash: low-frequency 8x8 DCT terms against their median."""
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8]
+    median = np.median(low.ravel()[1:])  # The DC term would swamp the median
+    return _pack_bits(low > median)
+
+
+def dhash(gray):
+    """64-bit difference hash: is each pixel brighter than its right neighbour (9x8 grid)."""
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    return _pack_bits(small[:, 1:] > small[:, :-1])
+
+
+def image_hashes(image):
+    """(pHash, dHash) of a DecodedImage, from a small pyramid level."""
+    gray = image.gray_at(Config.NEAR_DUPLICATE_HASH_SIDE)
+    return phash(gray), dhash(gray)
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")  # int.bit_count() needs Python 3.10
+
+
+class BKTree:
+    """Burkhard-Keller tree over 64-bit hashes for Hamming-radius queries.
+
+    Each child edge is labelled with its distance to the parent, so by the
+    triangle inequality a query of radius r only descends into edges within
+    r of the query's distance to the node.
+    """
+
+    def __init__(self):
+        self._root = None  # [key, values, {distance: child}]
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, key, value):
+        self._size += 1
+        if self._root is None:
+            self._root = [key, [value], {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming(key, node[0])
+            if distance == 0:
+                node[1].append(value)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [key, [value], {}]
+                return
+            node = child
+
+    def search(self, key, max_distance):
+        """[(distance, key, value)] for every stored key within max_distance, nearest first."""
+        if self._root is None:
+            return []
+        matches = []
+        stack = [self._root]
+        while stack:
+            node_key, values, children = stack.pop()
+            distance = hamming(key, node_key)
+            if distance <= max_distance:
+                matches.extend((distance, node_key, value) for value in values)
+            for edge, child in children.items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+        matches.sort(key=lambda match: match[0])
+        return matches
+
+
+class NearDuplicateIndex:
+    """Processed images by perceptual hash, for reusing analyses of near-copies.
+
+    Candidates are found by pHash in a BK-tree, then confirmed with dHash so
+    a chance pHash collision between unrelated images does not match.
+    """
+
+    def __init__(self, max_distance=None, max_dhash_distance=None, max_entries=None):
+        self.max_distance = Config.NEAR_DUPLICATE_MAX_DISTANCE if max_distance is None else max_distance
+        self.max_dhash_distance = (Config.NEAR_DUPLICATE_MAX_DHASH_DISTANCE
+                                   if max_dhash_distance is None else max_dhash_distance)
+        self.max_entries = max_entries or Config.NEAR_DUPLICATE_MAX_ENTRIES
+        self._tree = BKTree()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._tree)
+
+    def add(self, hashes, value):
+        """Index value under (pHash, dHash); False once the index is full."""
+        with self._lock:
+            if len(self._tree) >= self.max_entries:
+                return False
+            self._tree.add(hashes[0], (hashes[1], value))
+            return True
+
+    def lookup(self, hashes):
+        """(value, pHash distance, dHash distance) of the closest match, or None."""
+        with self._lock:
+            candidates = self._tree.search(hashes[0], self.max_distance)
+        best = None
+        for distance, _, (stored_dhash, value) in candidates:
+            dhash_distance = hamming(hashes[1], stored_dhash)
+            if dhash_distance > self.max_dhash_distance:
+                continue
+            if best is None or (distance, dhash_distance) < best[1:]:
+                best = (value, distance, dhash_distance)
+        return best
@@ -0,0 +1,124 @@
+# ocr_backends.py
+import threading
+import numpy as np
+from config import Config
+
+
+class OCRBackend:
+    """Turns an 8-bit grayscale/binary numpy image into text.
+
+    Construction must stay cheap; load() does the one-time setup and returns
+    False (after printing why) when the backend can't be used here.
+    """
+
+    name = "base"
+
+    def load(self):
+        raise NotImplementedError
+
+    def image_to_string(self, image):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class TesserocrBackend(OCRBackend):
+    """Tesseract's C++ API in-process via tesserocr.
+
+    The engine and language data are initialized once and reused, and images
+    are handed over as raw buffers, so there is no subprocess, temp file or
+    traineddata reload per call. One TessBaseAPI is not safe to share between
+    threads, so calls are serialized; tesserocr releases the GIL while it
+    recognizes, so other extractors still overlap with OCR.
+    """
+
+    name = "tesserocr"
+
+    def __init__(self):
+        self._api = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        try:
+            import tesserocr
+        except ImportError as e:
+            print(f"  tesserocr not available: {e}")
+            return False
+        try:
+            kwargs = {"lang": Config.OCR_LANGUAGE, "psm": Config.OCR_PAGE_SEG_MODE, "oem": Config.OCR_ENGINE_MODE}
+            if Config.TESSDATA_PATH:
+                kwargs["path"] = Config.TESSDATA_PATH
+            self._api = tesserocr.PyTessBaseAPI(**kwargs)
+        except Exception as e:
+            print(f"✗ tesserocr initialization failed: {e}")
+            return False
+        print(f"✓ {tesserocr.tesseract_version().splitlines()[0]} loaded in-process (tesserocr)")
+        return True
+
+    def image_to_string(self, image):
+        image = np.ascontiguousarray(image, dtype=np.uint8)
+        height, width = image.shape[:2]
+        with self._lock:
+            self._api.SetImageBytes(image.tobytes(), width, height, 1, width)
+            return self._api.GetUTF8Text()
+
+    def close(self):
+        with self._lock:
+            if self._api is not None:
+                self._api.End()
+                self._api = None
+
+
+class PytesseractBackend(OCRBackend):
+    """The tesseract CLI via pytesseract (one subprocess per call)."""
+
+    name = "pytesseract"
+
+    def load(self):
+        try:
+            import pytesseract
+        except ImportError as e:
+            print(f"✗ pytesseract not available: {e}")
+            return False
+
+        if Config.TESSERACT_PATH:
+            pytesseract.pytesseract.tesseract_cmd = Config.TESSERACT_PATH
+            print(f"✓ Tesseract configured at: {Config.TESSERACT_PATH}")
+
+        # Verify Tesseract works
+        try:
+            version = pytesseract.get_tesseract_version()
+            print(f"✓ Tesseract version: {version}")
+            return True
+        except Exception:
+            print("✗ Tesseract verification failed")
+            return False
+
+    def image_to_string(self, image):
+        import pytesseract
+        config = f"--oem {Config.OCR_ENGINE_MODE} --psm {Config.OCR_PAGE_SEG_MODE}"
+        return pytesseract.image_to_string(image, lang=Config.OCR_LANGUAGE, config=config)
+
+
+OCR_BACKENDS = {
+    "tesserocr": TesserocrBackend,
+    "pytesseract": PytesseractBackend,
+}
+
+
+def create_ocr_backend(name=None):
+    """Load the configured backend ("auto" prefers in-process tesserocr); None if nothing works."""
+    name = (name or Config.OCR_BACKEND).lower()
+    if name == "auto":
+        candidates = ["tesserocr", "pytesseract"]
+    elif name in OCR_BACKENDS:
+        candidates = [name]
+    else:
+        raise ValueError(f"Unknown OCR backend: {name}")
+
+    for candidate in candidates:
+        backend = OCR_BACKENDS[candidate]()
+        if backend.load():
+            return backend
+    return None
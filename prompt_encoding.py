@@ -0,0 +1,74 @@
+# prompt_encoding.py
+import re
+from llm_providers import estimate_tokens
+
+
+def summarize_objects(detected_objects):
+    """[(class, count, max confidence)], most frequent (then most confident) first."""
+    summary = {}
+    for obj in detected_objects:
+        count, best = summary.get(obj['object'], (0, 0.0))
+        summary[obj['object']] = (count + 1, max(best, obj['confidence']))
+    return sorted(((name, count, best) for name, (count, best) in summary.items()),
+                  key=lambda item: (-item[1], -item[2], item[0]))
+
+
+def format_objects(summary, limit=None):
+    shown = summary if limit is None else summary[:limit]
+    parts = [f"{name} x{count} (max conf {best:.2f})" if count > 1 else f"{name} ({best:.2f})"
+             for name, count, best in shown]
+    if len(shown) < len(summary):
+        parts.append(f"+{len(summary) - len(shown)} more classes")
+    return ", ".join(parts) if parts else "none"
+
+
+def compact_ocr_text(text, max_chars=None):
+    """Collapse whitespace, drop repeated lines and repeated words, then truncate."""
+    seen = set()
+    lines = []
+    for line in text.splitlines():
+        line = re.sub(r"\s+", " ", line).strip()
+        # OCR on repeating packaging often yields the same word many times in a row
+        line = re.sub(r"\b(\w+)(?: \1\b)+", r"\1", line, flags=re.IGNORECASE)
+        if line and line.lower() not in seen:
+            seen.add(line.lower())
+            lines.append(line)
+    compact = " / ".join(lines)
+    if max_chars is not None and len(compact) > max_chars:
+        compact = compact[:max(0, max_chars - 3)].rstrip() + "..."
+    return compact
+
+
+def encode_features(features, token_budget, max_ocr_chars=None):
+    """Compact feature block for the prompt, kept within token_budget (estimated) tokens.
+
+    OCR text is truncated first, then the least frequent object classes are
+    folded into "+N more classes". The blur, count and top-object lines are
+    always kept.
+    """
+    summary = summarize_objects(features['detected_objects'])
+    main_objects = ", ".join(dict.fromkeys(features['top_objects'])) or "none"
+    text = compact_ocr_text(features['detected_text'], max_ocr_chars)
+
+    def render(object_limit, ocr_text):
+        return f"""- Objects detected: {format_objects(summary, object_limit)}
+- Main objects: {main_objects}
+- Text found: "{ocr_text}"
+- Image sharpness: {features['blur_assessment']} (score: {features['blur_score']}/1.0)
+- Total objects: {features['object_count']}"""
+
+    block = render(None, text)
+    if estimate_tokens(block) <= token_budget:
+        return block
+
+    # ~4 characters per token (see estimate_tokens)
+    spare_chars = (token_budget - estimate_tokens(render(None, ""))) * 4
+    if spare_chars < len(text):
+        text = text[:max(0, spare_chars - 3)].rstrip() + "..." if spare_chars > 3 else ""
+    block = render(None, text)
+
+    object_limit = len(summary)
+    while estimate_tokens(block) > token_budget and object_limit > 1:
+        object_limit -= 1
+        block = render(object_limit, text)
+    return block
@@ -0,0 +1,65 @@
+# quality_gates.py
+from config import Config
+
+
+def evaluate_quality_gates(gates):
+    """Return the hard-threshold failures for extract_quality_gates() output.
+
+    An empty list means the image should go on to detection, OCR and reasoning.
+    The blur gate must only see extract_blur_score's full-resolution score: a
+    score from a reduced pyramid level reads sharp large uploads as blurred.
+    """
+    if gates is None:
+        return ["image could not be decoded"]
+
+    failures = []
+    if gates["blur_score"] < Config.GATE_MIN_BLUR_SCORE:
+        failures.append("image is severely blurred")
+    if gates["width"] < Config.GATE_MIN_WIDTH or gates["height"] < Config.GATE_MIN_HEIGHT:
+        failures.append(f"resolution too low ({gates['width']}x{gates['height']})")
+    if gates["brightness"] < Config.GATE_MIN_BRIGHTNESS:
+        failures.append("image is too dark")
+    elif gates["brightness"] > Config.GATE_MAX_BRIGHTNESS:
+        failures.append("image is overexposed")
+    return failures
+
+
+def gate_features(gates):
+    """Feature dict for an early-rejected image (no detection or OCR was run)."""
+    blur_score = gates["blur_score"] if gates else 0.0
+    return {
+        "detected_objects": [],
+        "detected_text": "",
+        "object_count": 0,
+        "has_text": False,
+        "blur_score": blur_score,
+        "blur_assessment": "sharp" if blur_score > 0.5 else "slightly blurry" if blur_score > 0.25 else "blurry",
+        "top_objects": [],
+        "object_summary": "not analyzed (rejected by quality gates)",
+        "quality_gates": gates,
+    }
+
+
+def gate_rejection_analysis(features, failures):
+    """Rule-based verdict for an image that failed a hard quality gate.
+
+    Mirrors the shape of LLMReasoner._enhanced_fallback_analysis so callers
+    can treat both the same way.
+    """
+    print(f"  Rejected by quality gates: {', '.join(failures)}")
+    sharpness = features["blur_score"]
+    final_score = max(0.1, min(0.3, sharpness * 0.3))
+    return {
+        "image_quality_score": round(final_score, 2),
+        "issues_detected": failures,
+        "warnings": [],
+        "detected_objects": [],
+        "text_detected": [],
+        "llm_reasoning_summary": "Rule-based analysis: Rejected by quality gates before detection and OCR "
+                                 f"({', '.join(failures)}).",
+        "final_verdict": "Not suitable for professional e-commerce use",
+        "confidence": 0.9,
+        "score_breakdown": {"sharpness": round(sharpness, 2)},
+        "analysis_method": "quality-gate",
+        "provisional": False,
+    }
@@ -0,0 +1,247 @@
+# rule_engine.py
+import re
+import numpy as np
+
+# Keyword lists shared by the rule-based analyzer and LLM validation
+PRODUCT_KEYWORDS = ['shoe', 'bag', 'watch', 'phone', 'laptop', 'product',
+                    'electronics', 'clothing', 'accessory', 'jewelry', 'perfume',
+                    'cosmetic', 'makeup', 'tool', 'equipment', 'instrument']
+NON_PRODUCT_KEYWORDS = ['person', 'face', 'hand', 'bed', 'couch', 'sofa',
+                        'food', 'animal', 'pet', 'toilet', 'bathroom', 'kitchen',
+                        'child', 'baby', 'dog', 'cat']
+PERSONAL_ITEM_KEYWORDS = ['person', 'bed', 'couch', 'sofa', 'food', 'toilet', 'bathroom', 'kitchen']
+PRODUCT_TEXT_INDICATORS = ['$', 'price', 'sale', 'brand', 'model', 'size', 'product', 'item']
+CASUAL_TEXT_INDICATORS = ['personal', 'name', 'www.', 'http', '@', 'funny', 'meme', 'lol']
+# LLM validation has always used a slightly different casual-text list
+LLM_CASUAL_TEXT_INDICATORS = ['personal', 'name', 'www.', 'http://', '@', 'casual', 'funny', 'meme']
+
+DEFAULT_WEIGHTS = {
+    "sharpness": 0.3,        # 30% - image quality
+    "object_focus": 0.4,     # 40% - subject matter
+    "background": 0.2,       # 20% - composition
+    "professionalism": 0.1,  # 10% - text/branding
+}
+
+VERDICTS = (
+    "Suitable for professional e-commerce use",
+    "Marginally suitable for professional e-commerce use",
+    "Not suitable for professional e-commerce use",
+)
+
+# Text categories, and the professionalism score each one gets
+TEXT_NONE, TEXT_SHORT, TEXT_PRODUCT, TEXT_CASUAL, TEXT_NEUTRAL = range(5)
+_PROFESSIONALISM = np.array([0.8, 0.6, 0.7, 0.3, 0.5])
+
+
+class KeywordMatcher:
+    """Substring matcher for a keyword list, equivalent to any(kw in text for kw in keywords).
+
+    Free text goes through one compiled regex alternation; object class names
+    come from a small fixed vocabulary, so their answers are memoized.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        alternation = "|".join(re.escape(kw) for kw in sorted(self.keywords, key=len, reverse=True))
+        self._pattern = re.compile(alternation)
+        self._class_memo = {}
+
+    def search(self, text):
+        return self._pattern.search(text) is not None
+
+    def matches_class(self, class_name):
+        hit = self._class_memo.get(class_name)
+        if hit is None:
+            hit = self._class_memo[class_name] = self.search(class_name)
+        return hit
+
+
+PRODUCT_MATCHER = KeywordMatcher(PRODUCT_KEYWORDS)
+NON_PRODUCT_MATCHER = KeywordMatcher(NON_PRODUCT_KEYWORDS)
+PERSONAL_ITEM_MATCHER = KeywordMatcher(PERSONAL_ITEM_KEYWORDS)
+PRODUCT_TEXT_MATCHER = KeywordMatcher(PRODUCT_TEXT_INDICATORS)
+CASUAL_TEXT_MATCHER = KeywordMatcher(CASUAL_TEXT_INDICATORS)
+LLM_CASUAL_TEXT_MATCHER = KeywordMatcher(LLM_CASUAL_TEXT_INDICATORS)
+
+
+class RuleSignals:
+    """Per-record inputs to the rules, as parallel NumPy arrays.
+
+    Extracting these is the only per-record Python work; rescoring the same
+    signals with different weights is fully vectorized.
+    """
+
+    def __init__(self, blur_score, product_count, non_product_count, total_objects, text_category):
+        self.blur_score = np.asarray(blur_score, dtype=np.float64)
+        self.product_count = np.asarray(product_count, dtype=np.int64)
+        self.non_product_count = np.asarray(non_product_count, dtype=np.int64)
+        self.total_objects = np.asarray(total_objects, dtype=np.int64)
+        self.text_category = np.asarray(text_category, dtype=np.int8)
+
+    def __len__(self):
+        return len(self.blur_score)
+
+    @classmethod
+    def from_features(cls, records):
+        """Build signals from FeatureExtractor.run_all dicts (live or stored)."""
+        blur, product, non_product, total, text = [], [], [], [], []
+        for features in records:
+            objects = [obj['object'].lower() for obj in features['detected_objects']]
+            blur.append(features['blur_score'])
+            product.append(sum(1 for obj in objects if PRODUCT_MATCHER.matches_class(obj)))
+            non_product.append(sum(1 for obj in objects if NON_PRODUCT_MATCHER.matches_class(obj)))
+            total.append(len(objects))
+            text.append(text_category(features))
+        return cls(blur, product, non_product, total, text)
+
+
+def text_category(features):
+    if not features['has_text']:
+        return TEXT_NONE
+    text = features['detected_text'].lower()
+    if len(text) <= 10:
+        return TEXT_SHORT
+    has_product_text = PRODUCT_TEXT_MATCHER.search(text)
+    has_casual_text = CASUAL_TEXT_MATCHER.search(text)
+    if has_product_text and not has_casual_text:
+        return TEXT_PRODUCT
+    if has_casual_text:
+        return TEXT_CASUAL
+    return TEXT_NEUTRAL
+
+
+class RuleScores:
+    """Vectorized rule output for a batch; result(i) materializes one analysis dict."""
+
+    def __init__(self, signals, scores, final_score, verdict, confidence, flags):
+        self.signals = signals
+        self.scores = scores
+        self.final_score = final_score
+        self.verdict = verdict  # Index into VERDICTS
+        self.confidence = confidence
+        self.flags = flags
+
+    def __len__(self):
+        return len(self.final_score)
+
+    def result(self, index, features=None):
+        """Same dict LLMReasoner's rule-based analysis returns for this record.
+
+        detected_objects/text_detected are filled in when the original
+        features dict is passed.
+        """
+        signals, flags = self.signals, self.flags
+        product_count = int(signals.product_count[index])
+        non_product_count = int(signals.non_product_count[index])
+        category = int(signals.text_category[index])
+
+        issues = []
+        warnings = []
+        if flags["non_product_issue"][index]:
+            issues.append(f"contains {non_product_count} non-product object(s)")
+        if flags["clutter_warning"][index]:
+            warnings.append("multiple objects (potential clutter)")
+        if flags["clutter_issue"][index]:
+            issues.append("too many objects (cluttered background)")
+        if category == TEXT_PRODUCT:
+            warnings.append("contains product/brand text")
+        elif category == TEXT_CASUAL:
+            issues.append("contains casual/personal text")
+        elif category == TEXT_NEUTRAL:
+            warnings.append("contains text")
+
+        # Build reasoning summary
+        reasoning_parts = []
+        sharpness = float(self.scores["sharpness"][index])
+        if sharpness >= 0.7:
+            reasoning_parts.append("Image is sharp and clear")
+        elif sharpness >= 0.4:
+            reasoning_parts.append("Image has acceptable sharpness")
+        else:
+            reasoning_parts.append("Image is blurry")
+        if product_count > 0:
+            reasoning_parts.append(f"Contains {product_count} product-like object(s)")
+        elif non_product_count > 0:
+            reasoning_parts.append(f"Contains {non_product_count} non-product object(s)")
+        if category != TEXT_NONE:
+            reasoning_parts.append("Contains text")
+        if len(issues) > 0:
+            reasoning_parts.append(f"Has {len(issues)} quality issue(s)")
+        elif len(warnings) > 0:
+            reasoning_parts.append(f"Has {len(warnings)} warning(s)")
+
+        result = {
+            "image_quality_score": round(float(self.final_score[index]), 2),
+            "issues_detected": issues,
+            "warnings": warnings,
+            "detected_objects": [],
+            "text_detected": [],
+            "llm_reasoning_summary": "Rule-based analysis: " + ". ".join(reasoning_parts) + ".",
+            "final_verdict": VERDICTS[self.verdict[index]],
+            "confidence": round(float(self.confidence[index]), 2),
+            "score_breakdown": {k: round(float(v[index]), 2) for k, v in self.scores.items()},
+        }
+        if features is not None:
+            result["detected_objects"] = features['top_objects'][:5]
+            result["text_detected"] = [features['detected_text']] if features['detected_text'] else []
+        return result
+
+    def results(self, records=None):
+        for index in range(len(self)):
+            yield self.result(index, records[index] if records is not None else None)
+
+
+class RuleEngine:
+    """Compiled, batch form of the rule-based e-commerce suitability analysis.
+
+    score() evaluates every rule as a NumPy expression over a whole batch of
+    records. Operations run in the same order and precision as the original
+    per-image code and rounding is done with Python's round(), so every
+    record gets exactly the score_breakdown, issues and verdict it would get
+    from LLMReasoner one image at a time.
+    """
+
+    def __init__(self, weights=None):
+        self.weights = dict(weights or DEFAULT_WEIGHTS)
+
+    def score(self, signals, weights=None):
+        """Score RuleSignals (or a list of feature dicts) and return RuleScores."""
+        if not isinstance(signals, RuleSignals):
+            signals = RuleSignals.from_features(signals)
+        weights = weights or self.weights
+
+        product = signals.product_count
+        non_product = signals.non_product_count
+        total = signals.total_objects
+        category = signals.text_category
+
+        scores = {
+            "sharpness": signals.blur_score,
+            "object_focus": np.where(product > 0, np.where(product == 1, 0.9, 0.8), np.where(non_product == 0, 0.6, 0.3)),
+            "background": np.where(total <= 2, 0.8, np.where(total <= 4, 0.6, 0.3)),
+            "professionalism": _PROFESSIONALISM[category],
+        }
+        flags = {
+            "non_product_issue": (product == 0) & (non_product > 0),
+            "clutter_warning": (total > 2) & (total <= 4),
+            "clutter_issue": total > 4,
+        }
+        issue_count = (flags["non_product_issue"].astype(np.int64) + flags["clutter_issue"]
+                       + (category == TEXT_CASUAL))
+
+        # Left-to-right sum in the same order as sum(scores[c] * weights[c] for c in scores)
+        final_score = np.zeros(len(signals))
+        for category_name in scores:
+            final_score = final_score + scores[category_name] * weights[category_name]
+        final_score = np.maximum(0.1, np.minimum(0.95, final_score))
+
+        suitable = (final_score >= 0.7) & (issue_count == 0)
+        marginal = ~suitable & (final_score >= 0.5) & (issue_count <= 1)
+        verdict = np.where(suitable, 0, np.where(marginal, 1, 2))
+        confidence = np.where(suitable, final_score, np.where(marginal, final_score * 0.9, np.maximum(0.5, final_score)))
+
+        return RuleScores(signals, scores, final_score, verdict, confidence, flags)
+
+    def analyze(self, features):
+        """Rule-based analysis dict for a single feature dict."""
+        return self.score([features]).result(0, features)
@@ -0,0 +1,362 @@
+# service.py
+import argparse
+import base64
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from config import Config
+from metrics import METRICS, LatencyStats, trace
+
+
+class _Job:
+    __slots__ = ("image", "future", "enqueued_at", "trace", "on_provisional")
+
+    def __init__(self, image, on_provisional=None):
+        self.image = image
+        self.on_provisional = on_provisional
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+        self.trace = None  # Spans from the quality gates, merged into the final timings
+
+
+class MicroBatcher:
+    """Gathers concurrent requests into micro-batches for one batched YOLO call.
+
+    A batch closes when it reaches max_batch_size or when the oldest request
+    has waited max_wait_ms. Feature extraction runs on the batching thread;
+    reasoning (LLM calls) runs on a separate pool so a slow LLM response never
+    holds up the next detection batch.
+    """
+
+    STAGES = ("queue_wait", "features", "reasoning", "total")
+
+    def __init__(self, analyzer, max_batch_size=None, max_wait_ms=None, max_queue=None, reasoning_workers=None):
+        self.analyzer = analyzer
+        self.max_batch_size = max_batch_size or Config.SERVICE_MAX_BATCH_SIZE
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else Config.SERVICE_MAX_WAIT_MS) / 1000
+        self._queue = queue.Queue(maxsize=max_queue or Config.SERVICE_MAX_QUEUE)
+        self._reasoning_pool = ThreadPoolExecutor(
+            max_workers=reasoning_workers or Config.SERVICE_REASONING_WORKERS, thread_name_prefix="reasoning"
+        )
+        self.latency = {stage: LatencyStats() for stage in self.STAGES}
+        self.batches = 0
+        self.batched_images = 0
+        self.rejected = 0
+        self.failed = 0
+        self._reasoning_in_flight = 0
+        self._counter_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, image, on_provisional=None):
+        """Queue a DecodedImage; returns a Future for the analyze()-style result dict.
+
+        on_provisional(result), if given, receives the rule-based result from the
+        reasoning thread before the LLM is called.
+        """
+        job = _Job(image, on_provisional)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._counter_lock:
+                self.rejected += 1
+            raise
+        return job.future
+
+    def _collect(self):
+        try:
+            first = self._queue.get(timeout=0.1)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = self._collect()
+            if not batch:
+                continue
+
+            started = time.monotonic()
+            for job in batch:
+                self.latency["queue_wait"].record(started - job.enqueued_at)
+
+            # Obvious rejects (cheap gates) and near-duplicates of earlier
+            # requests are answered without extraction and skip the batch
+            batch = [job for job in batch if not self._early_exit(job)]
+            if not batch:
+                continue
+            started = time.monotonic()
+            with self._counter_lock:
+                self.batches += 1
+                self.batched_images += len(batch)
+
+            try:
+                with trace() as batch_trace:
+                    all_features = self.analyzer.feature_extractor.run_all_batch([job.image for job in batch])
+            except Exception as e:
+                for job in batch:
+                    self._fail(job, e)
+                continue
+            feature_time = time.monotonic() - started
+            self.latency["features"].record(feature_time)
+
+            for job, features in zip(batch, all_features):
+                if features is None:
+                    self._fail(job, ValueError(f"Could not decode image: {job.image.name}"))
+                    continue
+                with self._counter_lock:
+                    self._reasoning_in_flight += 1
+                self._reasoning_pool.submit(self._reason, job, features, feature_time / len(batch),
+                                            batch_trace, 1 / len(batch))
+
+    def _early_exit(self, job):
+        try:
+            with trace() as job.trace:
+                result = self.analyzer.early_exit(job.image)
+                if result is None:
+                    # Wall-clock time the request arrived, so processing_time includes the queue wait
+                    received = time.time() - (time.monotonic() - job.enqueued_at)
+                    result = self.analyzer.near_duplicate(job.image, received)
+        except Exception as e:
+            self._fail(job, e)
+            return True
+        if result is None:
+            return False
+        self.latency["total"].record(time.monotonic() - job.enqueued_at)
+        job.future.set_result(result)
+        return True
+
+    def _reason(self, job, features, feature_time, batch_trace, share):
+        started = time.monotonic()
+        try:
+            with trace() as job_trace:
+                job_trace.merge(job.trace)
+                job_trace.merge(batch_trace, share)  # This image's share of the batched extraction
+                for result in self.analyzer._reason_stream(job.image.name, features, feature_time,
+                                                           self.analyzer._stages(job.image),
+                                                           provisional=job.on_provisional is not None):
+                    if result.get("provisional"):
+                        job.on_provisional(result)
+            self.analyzer._remember(job.image, result)
+        except Exception as e:
+            self._fail(job, e)
+            return
+        finally:
+            with self._counter_lock:
+                self._reasoning_in_flight -= 1
+        now = time.monotonic()
+        self.latency["reasoning"].record(now - started)
+        self.latency["total"].record(now - job.enqueued_at)
+        job.future.set_result(result)
+
+    def _fail(self, job, error):
+        with self._counter_lock:
+            self.failed += 1
+        job.future.set_exception(error)
+
+    def stats(self):
+        reasoner = self.analyzer.llm_reasoner
+        with self._counter_lock:
+            reasoning_in_flight = self._reasoning_in_flight
+            rejected, failed = self.rejected, self.failed
+            batches, batched_images = self.batches, self.batched_images
+        return {
+            "queue_depth": self._queue.qsize(),
+            "reasoning_in_flight": reasoning_in_flight,
+            "rejected": rejected,
+            "failed": failed,
+            "batches": batches,
+            "mean_batch_size": round(batched_images / batches, 2) if batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "latency": {stage: stats.summary() for stage, stats in self.latency.items()},
+            "metrics": METRICS.summary(),
+            "llm_routing": reasoner.routing_policy.stats() if reasoner else None,
+            "llm_providers": reasoner.llm_provider.stats()
+                             if reasoner and hasattr(reasoner.llm_provider, "stats") else None,
+        }
+
+    def close(self):
+        self._stopping.set()
+        self._thread.join(timeout=5)
+        self._reasoning_pool.shutdown(wait=True)
+
+
+class AnalysisRequestHandler(BaseHTTPRequestHandler):
+    """POST /analyze (raw image bytes, or JSON {"path": ...} / {"image_base64": ...}),
+    GET /stats, GET /metrics (Prometheus text), GET /healthz.
+
+    POST /analyze?stream=1 answers with JSON lines: the provisional rule-based
+    result as soon as it is ready, then the final result.
+    """
+
+    batcher = None  # Set by serve()
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/healthz":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/stats":
+            self._send_json(200, self.batcher.stats())
+        elif self.path == "/metrics":
+            body = METRICS.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != "/analyze":
+            self._send_json(404, {"error": "not found"})
+            return
+        stream = parse_qs(url.query).get("stream", ["0"])[0] not in ("0", "false", "")
+        try:
+            image = self._read_image()
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        updates = queue.Queue() if stream else None
+        try:
+            future = self.batcher.submit(image, on_provisional=updates.put if stream else None)
+        except queue.Full:
+            self._send_json(503, {"error": "analysis queue is full, retry later"})
+            return
+        if stream:
+            self._stream_results(future, updates)
+            return
+
+        try:
+            result = future.result(timeout=Config.SERVICE_REQUEST_TIMEOUT_SECONDS)
+        except FutureTimeoutError:  # Only an alias of the builtin from Python 3.11
+            self._send_json(504, {"error": "analysis timed out"})
+            return
+        except Exception as e:
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+            return
+        self._send_json(200, result)
+
+    def _stream_results(self, future, updates):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        future.add_done_callback(lambda _: updates.put(None))
+
+        deadline = time.monotonic() + Config.SERVICE_REQUEST_TIMEOUT_SECONDS
+        while True:
+            try:
+                update = updates.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                update = {"error": "analysis timed out"}
+            if update is None:
+                try:
+                    update = future.result()
+                except Exception as e:
+                    update = {"error": f"{type(e).__name__}: {e}"}
+            self.wfile.write(json.dumps(update, default=str).encode("utf-8") + b"\n")
+            self.wfile.flush()
+            if not update.get("provisional"):
+                return
+
+    def _read_image(self):
+        from image_io import DecodedImage
+
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0:
+            raise ValueError("empty request body")
+        body = self.rfile.read(length)
+
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            try:
+                payload = json.loads(body)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"invalid JSON: {e}")
+            if "image_base64" in payload:
+                try:
+                    data = base64.b64decode(payload["image_base64"], validate=True)
+                except (TypeError, ValueError) as e:
+                    raise ValueError(f"invalid image_base64: {e}")
+                return self._decoded(DecodedImage.from_bytes(data, name=payload.get("name")))
+            if "path" in payload:
+                if not Config.SERVICE_ALLOW_PATH_INPUT:
+                    raise ValueError("path input is disabled on this server")
+                return self._decoded(DecodedImage.from_path(payload["path"]))
+            raise ValueError("expected 'path' or 'image_base64'")
+
+        return self._decoded(DecodedImage.from_bytes(body, name=self.headers.get("X-Filename") or "upload"))
+
+    def _decoded(self, image):
+        """Decode now, on the request thread, so a bad upload gets a 400 instead of
+        an all-zero analysis. The batcher reuses the decode."""
+        try:
+            self.batcher.analyzer.feature_extractor.prepare(image)
+        except ValueError:
+            raise
+        except Exception as e:
+            raise ValueError(f"could not read image: {e}")
+        return image
+
+    def log_message(self, format, *args):
+        pass  # Request logging would dominate output under load
+
+
+def serve(host=None, port=None, max_batch_size=None, max_wait_ms=None, rules_only=False):
+    from main import MultimodalAnalyzer
+
+    analyzer = MultimodalAnalyzer(rules_only=rules_only)
+    # Load YOLO and verify Tesseract before taking traffic
+    analyzer.feature_extractor.load_models()
+
+    batcher = MicroBatcher(analyzer, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    AnalysisRequestHandler.batcher = batcher
+    server = ThreadingHTTPServer((host or Config.SERVICE_HOST, port or Config.SERVICE_PORT), AnalysisRequestHandler)
+    server.daemon_threads = True
+
+    print(f"✓ Analysis service listening on http://{server.server_address[0]}:{server.server_address[1]}")
+    print(f"  Micro-batching: up to {batcher.max_batch_size} images, {batcher.max_wait * 1000:.0f}ms max wait")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the image analysis service with request micro-batching.")
+    parser.add_argument("--host", default=None)
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--max-batch-size", type=int, default=None)
+    parser.add_argument("--max-wait-ms", type=float, default=None)
+    parser.add_argument("--rules-only", action="store_true")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.max_batch_size, args.max_wait_ms, args.rules_only)
@@ -0,0 +1,38 @@
+# test_blur_score.py
+import cv2
+import numpy as np
+import pytest
+from feature_extractor import FeatureExtractor
+from image_io import DecodedImage
+
+
+def large_scene(width=4000, height=3000, seed=0):
+    """Sharp synthetic product-style scene: flat background, shapes and a label."""
+    rng = np.random.default_rng(seed)
+    image = np.full((height, width, 3), 230, np.uint8)
+    for _ in range(150):
+        color = tuple(int(c) for c in rng.integers(0, 255, 3))
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        cv2.circle(image, center, int(rng.integers(10, width // 12)), color, -1)
+    cv2.putText(image, "BRAND 250ml", (width // 3, height // 2), cv2.FONT_HERSHEY_SIMPLEX, 4, (20, 20, 20), 6)
+    return image
+
+
+def full_resolution_score(data):
+    gray = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_GRAYSCALE)
+    return max(0, min(1, cv2.Laplacian(gray, cv2.CV_64F).var() / 200))
+
+
+@pytest.mark.parametrize("sigma", [0, 1.0, 2.5])
+def test_large_image_scores_like_its_full_resolution_decode(sigma):
+    scene = large_scene()
+    if sigma:
+        scene = cv2.GaussianBlur(scene, (0, 0), sigma)
+    data = cv2.imencode(".jpg", scene, [cv2.IMWRITE_JPEG_QUALITY, 92])[1].tobytes()
+
+    extractor = FeatureExtractor(concurrent=False)
+    image = DecodedImage.from_bytes(data)
+    extractor.prepare(image)  # reduced-resolution pyramid, as run_all sets it up
+
+    assert extractor.extract_blur_score(image) == pytest.approx(full_resolution_score(data), abs=0.02)
+    assert image._bgr is None  # scoring did not keep a full-resolution decode
@@ -0,0 +1,65 @@
+# test_llm_chain.py
+import asyncio
+import time
+from async_llm import AsyncLLMClient
+from config import Config
+from llm_chain import CircuitBreaker, ProviderChain
+from llm_providers import FakeProvider
+
+
+def slow_and_fast_chain(hedging=False):
+    slow = FakeProvider(name="slow", latency=1.0)
+    fast = FakeProvider(name="fast")
+    breakers = [CircuitBreaker(p.name, window=10, min_calls=4, error_rate=0.5, cooldown=60) for p in (slow, fast)]
+    return ProviderChain([slow, fast], hedging=hedging, breakers=breakers), slow, fast
+
+
+def run_calls(client, count):
+    async def main():
+        return [await client.generate(f"prompt {i}") for i in range(count)]
+    return asyncio.run(main())
+
+
+def test_async_chain_fails_over_from_a_slow_provider_and_opens_its_breaker():
+    chain, _, fast = slow_and_fast_chain()
+    client = AsyncLLMClient(chain, timeout=0.2, max_retries=0)
+
+    replies = run_calls(client, 8)
+
+    assert len(replies) == 8
+    assert fast.calls == 8
+    # Four timeouts open the slow provider's breaker; later calls skip it
+    assert chain.breakers[0].opened == 1
+    assert chain.stats()["slow"]["state"] == CircuitBreaker.OPEN
+    assert chain.stats()["fast"]["window_calls"] == 8
+
+
+def test_hedged_async_chain_answers_before_the_slow_provider_times_out(monkeypatch):
+    monkeypatch.setattr(Config, "LLM_HEDGE_DEFAULT_DELAY_SECONDS", 0.05)
+    chain, _, fast = slow_and_fast_chain(hedging=True)
+    client = AsyncLLMClient(chain, timeout=2, max_retries=0)
+
+    started = time.monotonic()
+    replies = run_calls(client, 4)
+
+    assert len(replies) == 4
+    assert fast.calls == 4
+    assert time.monotonic() - started < 1.0  # never waited out the slow provider
+    # Each hedge win charges the abandoned first call as slow
+    assert chain.breakers[0].opened == 1
+
+
+def test_cancelled_chain_call_counts_against_the_running_provider():
+    chain, _, _ = slow_and_fast_chain()
+
+    async def main():
+        task = asyncio.ensure_future(chain.agenerate("prompt", timeout=5))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(main())
+    assert chain.stats()["slow"]["window_failures"] == 1
@@ -0,0 +1,84 @@
+# test_manifest.py
+import os
+from types import SimpleNamespace
+import cv2
+import numpy as np
+import pytest
+from main import run_batch
+from manifest import CatalogManifest, IncrementalAnalyzer
+
+
+class StubAnalyzer:
+    """Stands in for MultimodalAnalyzer: no models, one fixed verdict per image."""
+
+    llm_reasoner = None
+    feature_extractor = SimpleNamespace(ocr_backend_name=None)
+
+    def __init__(self):
+        self.analyzed = []
+
+    def analyze_many(self, images, batch_size=None, on_features=None):
+        for image in images:
+            self.analyzed.append(image.name)
+            features = {"blur_score": 1.0}
+            if on_features is not None:
+                on_features(image.name, features)
+            yield image.name, {"final_verdict": "Suitable", "features": features}, None
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    directory = tmp_path / "catalog"
+    directory.mkdir()
+    paths = []
+    for index in range(4):
+        path = str(directory / f"{index}.jpg")
+        cv2.imwrite(path, np.full((32, 32, 3), index * 60, np.uint8))
+        paths.append(path)
+    return str(directory), paths
+
+
+def run(manifest, paths, resume_from=0, prune_roots=None):
+    runner = IncrementalAnalyzer(StubAnalyzer(), manifest)
+    with open(os.devnull, "w") as output, open(os.devnull, "w") as progress:
+        run_batch(runner, paths, output, resume_from=resume_from, progress=progress)
+    if prune_roots is not None:
+        runner.prune(prune_roots)
+    return runner
+
+
+def test_resumed_and_single_file_runs_keep_every_entry(tmp_path, catalog):
+    _, paths = catalog
+    manifest = CatalogManifest(str(tmp_path / "manifest.sqlite3"))
+    run(manifest, paths)
+    assert len(manifest) == 4
+
+    run(manifest, paths, resume_from=2)
+    assert len(manifest) == 4
+    run(manifest, paths[:1])
+    assert len(manifest) == 4
+
+
+def test_prune_drops_only_missing_files_under_the_scanned_directory(tmp_path, catalog):
+    directory, paths = catalog
+    elsewhere = str(tmp_path / "other.jpg")
+    cv2.imwrite(elsewhere, np.zeros((32, 32, 3), np.uint8))
+    manifest = CatalogManifest(str(tmp_path / "manifest.sqlite3"))
+    run(manifest, paths + [elsewhere])
+
+    os.remove(paths[3])
+    runner = run(manifest, paths[:3], prune_roots=[directory])
+
+    assert runner.counts["pruned"] == 1
+    assert manifest.get(os.path.abspath(paths[3])) is None
+    assert manifest.get(os.path.abspath(elsewhere)) is not None
+    assert len(manifest) == 4
+
+
+def test_main_refuses_prune_on_a_resumed_run(tmp_path, catalog, capsys):
+    from main import main
+
+    directory, _ = catalog
+    manifest_path = str(tmp_path / "manifest.sqlite3")
+    assert main([directory, "--manifest", manifest_path, "--prune", "--resume-from", "2"]) == 2
+    assert "--prune" in capsys.readouterr().err
@@ -0,0 +1,38 @@
+# test_quality_gates.py
+import cv2
+import numpy as np
+import pytest
+from config import Config
+from image_io import DecodedImage
+from main import MultimodalAnalyzer
+
+
+def studio_shot(width=4000, height=3000):
+    """Sharp large product shot: plain backdrop, one box with a printed label."""
+    image = np.full((height, width, 3), 235, np.uint8)
+    cv2.rectangle(image, (width // 3, height // 4), (2 * width // 3, 3 * height // 4), (40, 90, 160), -1)
+    cv2.putText(image, "BRAND 250ml", (width // 3 + 40, height // 2), cv2.FONT_HERSHEY_SIMPLEX, 2.5, (255, 255, 255), 5)
+    return image
+
+
+@pytest.fixture
+def analyzer(monkeypatch):
+    monkeypatch.setattr(Config, "EARLY_EXIT_ENABLED", True)
+    monkeypatch.setattr(Config, "FEATURE_CACHE_ENABLED", False)
+    return MultimodalAnalyzer(rules_only=True)
+
+
+def encoded(image):
+    return DecodedImage.from_bytes(cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 92])[1].tobytes())
+
+
+def test_sharp_large_upload_passes_the_blur_gate(analyzer):
+    image = encoded(studio_shot())
+    assert analyzer.early_exit(image) is None
+    assert image.derived["quality_gates"]["blur_score"] >= Config.GATE_MIN_BLUR_SCORE
+
+
+def test_blurred_large_upload_is_rejected(analyzer):
+    output = analyzer.early_exit(encoded(cv2.GaussianBlur(studio_shot(), (0, 0), 8)))
+    assert output["stages_run"] == ["quality_gates"]
+    assert "image is severely blurred" in output["issues_detected"]
@@ -0,0 +1,69 @@
+# test_text_regions.py
+import cv2
+import numpy as np
+from feature_extractor import FeatureExtractor
+from image_io import DecodedImage
+from text_regions import detect_text_regions
+
+
+def product_on_backdrop(label_y=None):
+    """1024x768 backdrop with one outlined box; label_y puts a printed label on the box."""
+    image = np.full((768, 1024, 3), 225, np.uint8)
+    cv2.rectangle(image, (250, 250), (750, 550), (60, 140, 200), -1)
+    cv2.rectangle(image, (250, 250), (750, 550), (0, 0, 0), 3)
+    if label_y is not None:
+        cv2.putText(image, "ORGANIC TEA 250g", (282, label_y), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (255, 255, 255), 2)
+    return image
+
+
+def gray(image):
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def covers(regions, y):
+    return any(top <= y <= top + h for _, top, _, h in regions)
+
+
+def test_label_printed_on_an_outlined_box_is_found():
+    assert covers(detect_text_regions(gray(product_on_backdrop(label_y=430))), 420)
+
+
+def test_label_touching_the_outline_is_found():
+    assert covers(detect_text_regions(gray(product_on_backdrop(label_y=290))), 280)
+
+
+def test_text_running_across_a_curved_outline_is_found():
+    image = np.full((768, 1024, 3), 200, np.uint8)
+    cv2.ellipse(image, (500, 380), (160, 220), 0, 0, 360, (150, 40, 40), -1)
+    cv2.ellipse(image, (500, 380), (160, 220), 0, 0, 360, (0, 0, 0), 3)
+    cv2.putText(image, "new $19.99 brand", (250, 180), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 0), 2)
+    assert covers(detect_text_regions(gray(image)), 170)
+
+
+def test_text_free_product_shot_skips_ocr():
+    assert detect_text_regions(gray(product_on_backdrop())) == []
+
+
+def test_headline_text_falls_back_to_whole_image_ocr():
+    image = np.full((768, 1024, 3), 240, np.uint8)
+    cv2.putText(image, "SALE", (150, 500), cv2.FONT_HERSHEY_SIMPLEX, 9, (0, 0, 200), 25)
+    assert detect_text_regions(gray(image)) is None
+
+
+class RecordingOCR:
+    name = "recording"
+
+    def __init__(self):
+        self.calls = 0
+
+    def image_to_string(self, pixels):
+        self.calls += 1
+        return "ORGANIC TEA 250g"
+
+
+def test_extract_text_runs_ocr_on_a_label_on_an_object():
+    ocr = RecordingOCR()
+    extractor = FeatureExtractor(concurrent=False, ocr_backend=ocr)
+    image = DecodedImage.from_array(product_on_backdrop(label_y=430))
+    assert extractor.extract_text(image) == "ORGANIC TEA 250g"
+    assert ocr.calls >= 1
@@ -0,0 +1,84 @@
+# text_regions.py
+import cv2
+import numpy as np
+from config import Config
+
+
+def detect_text_regions(gray, max_regions=None):
+    """Find candidate text boxes in a grayscale image with a morphological detector.
+
+    Text shows up as dense clusters of strong, short-range gradients. A
+    morphological gradient picks those out and a fixed threshold binarizes
+    them (Otsu would let an object's strong outline push faint glyph edges
+    under the cut). Edge components larger than any glyph are object outlines
+    and are removed first, so text printed on, or running across, an object
+    is not merged into its outline. A wide closing kernel then joins
+    characters into line-shaped blobs; blobs that are the wrong shape or too
+    sparse to be text are dropped.
+
+    Returns a list of (x, y, w, h) boxes in reading order (top to bottom, left
+    to right), or None when the image is better OCR'd whole: more than
+    max_regions candidates (text-heavy), or a row of glyph-like components
+    too large to tell from outlines (headline-sized text).
+    """
+    max_regions = max_regions or Config.OCR_MAX_REGIONS
+    height, width = gray.shape[:2]
+
+    gradient = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+    _, binary = cv2.threshold(gradient, Config.TEXT_REGION_MIN_GRADIENT - 1, 255, cv2.THRESH_BINARY)
+
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    extent = np.maximum(stats[:, cv2.CC_STAT_WIDTH], stats[:, cv2.CC_STAT_HEIGHT])
+    oversized = extent > Config.TEXT_REGION_MAX_GLYPH * max(height, width)
+    oversized[0] = False  # Background
+    if _large_text_row(stats[oversized]):
+        return None
+    binary[oversized[labels]] = 0
+    connected = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (21, 3)))
+
+    # RETR_LIST: text inside an object's remaining edges is its own contour
+    contours, _ = cv2.findContours(connected, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+    regions = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if h < Config.TEXT_REGION_MIN_HEIGHT or w < Config.TEXT_REGION_MIN_HEIGHT:
+            continue
+        if h > height * 0.5 or w < h * 0.8:
+            continue  # Too tall or too narrow for a line of text
+        fill = cv2.countNonZero(binary[y:y + h, x:x + w]) / float(w * h)
+        if fill < 0.25:
+            continue  # Outline of a large shape rather than glyph strokes
+        regions.append((x, y, w, h))
+
+    if len(regions) > max_regions:
+        return None
+    return sorted(regions, key=lambda box: (box[1], box[0]))
+
+
+def _large_text_row(stats, min_glyphs=3):
+    """Whether oversized components include min_glyphs of similar height side by side on one line."""
+    boxes = sorted((int(x), int(y), int(w), int(h)) for x, y, w, h, _ in stats)
+    for index, (x, y, w, h) in enumerate(boxes):
+        row, right = 1, x + w
+        for nx, ny, nw, nh in boxes[index + 1:]:
+            if nx - right > h / 2:
+                break  # Sorted by x: everything further is further away
+            if 0.75 * h <= nh <= 1.33 * h and abs((ny + nh) - (y + h)) < h / 8:  # Shared baseline
+                row, right = row + 1, max(right, nx + nw)
+        if row >= min_glyphs:
+            return True
+    return False
+
+
+def scale_regions(regions, from_shape, to_shape, padding=4):
+    """Map boxes found on one pyramid level onto another, padded and clipped."""
+    scale_x = to_shape[1] / from_shape[1]
+    scale_y = to_shape[0] / from_shape[0]
+    scaled = []
+    for x, y, w, h in regions:
+        x0 = max(0, int(x * scale_x) - padding)
+        y0 = max(0, int(y * scale_y) - padding)
+        x1 = min(to_shape[1], int((x + w) * scale_x) + padding)
+        y1 = min(to_shape[0], int((y + h) * scale_y) + padding)
+        scaled.append((x0, y0, x1 - x0, y1 - y0))
+    return scaled